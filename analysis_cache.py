@@ -0,0 +1,136 @@
+"""
+Shared, content-addressed cache of article analyses.
+
+Entries are keyed by a hash of the normalized article content plus the
+analysis version (model and prompt revision), so the same text submitted by
+any user reuses one set of Gemini results. Entries expire after a TTL and the
+least recently used ones are evicted once the cache exceeds its size limit.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+from model_routing import routing_signature
+from models import AnalysisCacheEntry
+from text_utils import content_digest
+
+# Bump ANALYSIS_PROMPT_VERSION whenever the summary/factuality prompts change;
+# changing the models routed to those stages invalidates entries automatically
+ANALYSIS_MODEL = routing_signature('summary', 'factuality', 'bundle')
+ANALYSIS_PROMPT_VERSION = '1'
+
+ANALYSIS_CACHE_ENABLED = os.getenv('ANALYSIS_CACHE_ENABLED', 'true').lower() == 'true'
+ANALYSIS_CACHE_TTL_HOURS = int(os.getenv('ANALYSIS_CACHE_TTL_HOURS', '168'))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', '10000'))
+
+
+class AnalysisCache:
+    """Cross-user analysis cache stored in the main database."""
+
+    def __init__(self, db_manager, enabled=ANALYSIS_CACHE_ENABLED,
+                 ttl_hours=ANALYSIS_CACHE_TTL_HOURS, max_entries=ANALYSIS_CACHE_MAX_ENTRIES):
+        self.db_manager = db_manager
+        self.enabled = enabled
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(content):
+        """Cache key for a piece of article content."""
+        return content_digest(content, ANALYSIS_MODEL, ANALYSIS_PROMPT_VERSION)
+
+    def get(self, content):
+        """Return the cached analysis dict for this content, or None."""
+        if not self.enabled:
+            return None
+        session = self.db_manager.get_session()
+        try:
+            entry = session.query(AnalysisCacheEntry).filter_by(cache_key=self.make_key(content)).first()
+            now = datetime.utcnow()
+            if not entry or entry.created_at < now - self.ttl:
+                self._count(hit=False)
+                return None
+
+            entry.last_accessed = now
+            entry.hits = (entry.hits or 0) + 1
+            session.commit()
+            self._count(hit=True)
+            return {
+                'title': entry.title,
+                'summary': entry.summary,
+                'factuality_score': entry.factuality_score,
+                'factuality_level': entry.factuality_level,
+                'factuality_description': entry.factuality_description,
+                'factuality_breakdown': list(entry.factuality_breakdown or [])
+            }
+        except Exception as e:
+            session.rollback()
+            print(f"Error reading analysis cache: {e}")
+            return None
+        finally:
+            session.close()
+
+    def put(self, content, analysis):
+        """Store an analysis for this content and evict expired/excess entries."""
+        if not self.enabled:
+            return
+        session = self.db_manager.get_session()
+        try:
+            key = self.make_key(content)
+            now = datetime.utcnow()
+            entry = session.query(AnalysisCacheEntry).filter_by(cache_key=key).first()
+            if entry is None:
+                entry = AnalysisCacheEntry(cache_key=key, hits=0)
+                session.add(entry)
+            entry.title = analysis.get('title')
+            entry.summary = analysis['summary']
+            entry.factuality_score = analysis.get('factuality_score')
+            entry.factuality_level = analysis.get('factuality_level')
+            entry.factuality_description = analysis.get('factuality_description')
+            entry.factuality_breakdown = list(analysis.get('factuality_breakdown') or [])
+            entry.created_at = now
+            entry.last_accessed = now
+            session.commit()
+            self._evict(session, now)
+        except Exception as e:
+            session.rollback()
+            print(f"Error writing analysis cache: {e}")
+        finally:
+            session.close()
+
+    def _evict(self, session, now):
+        """Drop expired entries, then the least recently used ones over the size limit."""
+        session.query(AnalysisCacheEntry).filter(
+            AnalysisCacheEntry.created_at < now - self.ttl
+        ).delete(synchronize_session=False)
+
+        overflow = session.query(AnalysisCacheEntry).count() - self.max_entries
+        if overflow > 0:
+            stale_ids = [row.id for row in (session.query(AnalysisCacheEntry.id)
+                                            .order_by(AnalysisCacheEntry.last_accessed)
+                                            .limit(overflow))]
+            session.query(AnalysisCacheEntry).filter(
+                AnalysisCacheEntry.id.in_(stale_ids)
+            ).delete(synchronize_session=False)
+        session.commit()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        """Hit/miss counters since startup."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
@@ -1,42 +1,86 @@
 # app.py
 
-from flask import Flask, render_template, request, jsonify, session, url_for, g, current_app
-import google.generativeai as genai
-from newspaper import Article
+from flask import Flask, render_template, request, jsonify, session, url_for, g, current_app, Response, stream_with_context
 import nltk
 import re
 import os
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import warnings
 from urllib.parse import urlparse
 from datetime import datetime
 from pathlib import Path
 from models import Base, init_db
-from sqlalchemy import create_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
 from helpers import (
-    is_political_article,
-    is_content_safe,
+    GateChecks,
     generate_article_title,
+    submit_analysis_task,
     get_existing_article,
     helpers_bp
 )
 from auth import auth_bp, login_required
 from game_routes import game_bp
-from database import db_manager, get_db_session, close_db
+from database import db_manager, get_db_session, close_db, create_db_engine, decode_cursor
+from jobs import JobQueue, JobWorkerPool, RetryableJobError
+from analysis_cache import AnalysisCache
+from fetcher import fetch_article, normalize_url
+from dedup_index import NearDuplicateIndex, NEAR_DUPLICATE_ENABLED
+from text_utils import chunk_text, estimate_tokens, content_digest
+from singleflight import SingleFlight
+from metrics import stage_metrics
+import llm
+from llm import LLMUnavailableError
+import recordings
+from batch import parse_batch, run_batch, BATCH_DEFAULT_PARALLELISM
+import political_classifier
+import content_screen
 
 # Load environment
 load_dotenv()
 warnings.filterwarnings("ignore")
 
-# NLTK
+# NLTK (punkt_tab is the sentence model used by current NLTK releases)
 nltk.download('punkt', quiet=True)
+nltk.download('punkt_tab', quiet=True)
 
-# Gemini API
+# Gemini API (replay mode serves recorded replies and needs no key)
 API_KEY = os.getenv('API_KEY')
-if not API_KEY:
-    raise ValueError("Gemini API key not found in .env")
-genai.configure(api_key=API_KEY)
+if recordings.BACKEND_MODE != 'replay':
+    if not API_KEY:
+        raise ValueError("Gemini API key not found in .env")
+    llm.configure(API_KEY)
+    llm.warm_up()
+
+# Articles longer than this many (estimated) tokens are summarized and
+# fact-checked chunk by chunk in parallel, then reduced into one result
+CHUNK_TOKEN_BUDGET = int(os.getenv('CHUNK_TOKEN_BUDGET', '3000'))
+CHUNK_WORKERS = int(os.getenv('CHUNK_WORKERS', '8'))
+_chunk_executor = ThreadPoolExecutor(max_workers=CHUNK_WORKERS, thread_name_prefix='chunk-analysis')
+
+# Single-call "analysis bundle" mode (off by default)
+ANALYSIS_BUNDLE_MODE = os.getenv('ANALYSIS_BUNDLE_MODE', 'false').lower() == 'true'
+
+# Shown when Gemini is throttling us or down (see llm.py)
+LLM_UNAVAILABLE_MESSAGE = 'The analysis service is busy right now. Please try again in a minute.'
+
+# Queue detector submissions for background workers instead of analyzing inline
+ASYNC_DETECTOR_JOBS = os.getenv('ASYNC_DETECTOR_JOBS', 'false').lower() == 'true'
+
+# Inline (non-queued) streamed submissions run on a bounded pool; beyond the
+# running workers plus the backlog, /detector/stream answers 503
+DETECTOR_STREAM_WORKERS = int(os.getenv('DETECTOR_STREAM_WORKERS', '8'))
+DETECTOR_STREAM_BACKLOG = int(os.getenv('DETECTOR_STREAM_BACKLOG', '8'))
+_stream_executor = ThreadPoolExecutor(max_workers=DETECTOR_STREAM_WORKERS, thread_name_prefix='detector-stream')
+_stream_slots = threading.BoundedSemaphore(DETECTOR_STREAM_WORKERS + DETECTOR_STREAM_BACKLOG)
+DETECTOR_BUSY_MESSAGE = 'TruthGuard is busy analyzing other articles. Please try again in a minute.'
+
+# How often a streamed queued submission checks its job for new progress
+JOB_STREAM_POLL_SECONDS = float(os.getenv('JOB_STREAM_POLL_SECONDS', '0.25'))
 
 # Flask setup
 app = Flask(__name__)
@@ -46,7 +90,9 @@ if not app.secret_key:
 
 # Database setup
 def get_db_path():
-    """Get the path to the SQLite database file."""
+    """Get the path to the SQLite database file (DATABASE_PATH overrides it)."""
+    if os.getenv('DATABASE_PATH'):
+        return os.getenv('DATABASE_PATH')
     db_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
     os.makedirs(db_dir, exist_ok=True)
     return os.path.join(db_dir, 'truthguard.db')
@@ -58,7 +104,7 @@ def init_database():
     
     # Only create tables if they don't exist
     if not os.path.exists(db_path):
-        engine = create_engine(db_uri)
+        engine = create_db_engine(db_uri)
         Base.metadata.create_all(engine)
         print(f"Database created at {db_path}")
     
@@ -70,6 +116,18 @@ def init_database():
 with app.app_context():
     init_database()
 
+# Shared cross-user analysis cache
+analysis_cache = AnalysisCache(db_manager)
+
+# Near-duplicate (MinHash/LSH) index over stored articles, rebuilt in the background
+near_duplicates = NearDuplicateIndex()
+if NEAR_DUPLICATE_ENABLED:
+    near_duplicates.rebuild_in_background(db_manager)
+
+# Identical submissions in flight at the same time (double clicks, client
+# retries) share one pipeline run
+detector_flights = SingleFlight()
+
 # Register blueprints
 app.register_blueprint(helpers_bp)
 app.register_blueprint(auth_bp)
@@ -97,133 +155,516 @@ def home():
 def detector():
     active_page = 'detector'
     if request.method == 'POST':
+        user_id = session.get('user_id')
+
+        # Async mode: hand the submission to the background workers and let the
+        # client poll the job status instead of holding this worker
+        if ASYNC_DETECTOR_JOBS:
+            try:
+                job_id = job_queue.enqueue(request.form.to_dict(), user_id=user_id)
+            except Exception as e:
+                current_app.logger.error(f"Job enqueue error: {e}")
+                return jsonify({'error':'Error queueing your request. Please try again.'})
+            return jsonify({
+                'job_id': job_id,
+                'status_url': url_for('detector_job_status', job_id=job_id)
+            }), 202
+
+        return jsonify(detector_reply(run_detector(request.form, user_id)))
+
+    return render_template('detector.html', active_page=active_page)
+
+@app.route('/detector/jobs/<job_id>')
+@login_required
+def detector_job_status(job_id):
+    """Report the status of a queued detector job owned by the current user."""
+    job = job_queue.get(job_id)
+    if not job or job['user_id'] != session.get('user_id'):
+        return jsonify({'error': 'Job not found'}), 404
+
+    if job['status'] == 'done':
+        reply = detector_reply(job['result'])
+        reply['status'] = 'done'
+        return jsonify(reply)
+    if job['status'] == 'failed':
+        return jsonify({'status': 'failed', 'error': 'Error processing your request. Please try again.'})
+    return jsonify({'status': job['status']})
+
+@app.route('/detector/stream', methods=['POST'])
+@login_required
+def detector_stream():
+    """
+    Runs the detector pipeline and streams each stage as a Server-Sent Event:
+    fetched, political, safety, title, summary, factuality and one breakdown
+    event per item, ending with done (redirect_url) or error.
+
+    With ASYNC_DETECTOR_JOBS the submission is queued like /detector and the
+    stream relays the job's progress; otherwise it runs on a bounded pool and
+    the route answers 503 when that pool is full.
+    """
+    form = request.form.to_dict()
+    user_id = session.get('user_id')
+
+    if ASYNC_DETECTOR_JOBS:
         try:
-            input_type       = request.form.get('input-type')
-            title_method     = request.form.get('title-input-method')
-            manual_title     = request.form.get('article-title')
-            content, source_url = '', None
-            title = 'No Title'
-
-            # Title handling
-            if title_method == 'manual':
-                if not manual_title:
-                    return jsonify({'error':'Please enter the article title.'})
-                title = manual_title.strip()
-            elif title_method != 'automatic':
-                return jsonify({'error':'Please select a title input method.'})
-
-            # Content extraction
-            if input_type == 'link':
-                url = request.form.get('article-link')
-                if not url:
-                    return jsonify({'error':'Please enter a valid URL.'})
-                try:
-                    art = Article(url)
-                    art.download(); art.parse()
-                    content = art.text
-                    source_url = url
-                    if not content:
-                        raise ValueError("No content extracted from URL")
-                    if title_method == 'automatic':
-                        title = generate_article_title(content, input_type, url)
-                except Exception as e:
-                    current_app.logger.error(f"URL extraction error: {e}")
-                    return jsonify({'error':'Failed to extract content from the URL. Please check if the URL is accessible.'})
-            elif input_type == 'snippet':
-                snippet = request.form.get('article-snippet')
-                if not snippet:
-                    return jsonify({'error':'Please enter an article snippet.'})
-                content = snippet.strip()
-                if title_method == 'automatic':
-                    title = generate_article_title(content, input_type)
-            else:
-                return jsonify({'error':'Please select an input method (Link or Snippet).'})
+            job_id = job_queue.enqueue(form, user_id=user_id)
+        except Exception as e:
+            current_app.logger.error(f"Job enqueue error: {e}")
+            return jsonify({'error': 'Error queueing your request. Please try again.'}), 500
+        return sse_response(stream_job_events(job_id))
+
+    if not _stream_slots.acquire(blocking=False):
+        return jsonify({'error': DETECTOR_BUSY_MESSAGE, 'retryable': True}), 503, {'Retry-After': '30'}
+
+    events = queue.Queue()
+
+    def run():
+        result = {'error': 'An unexpected error occurred. Please try again.'}
+        try:
+            result = run_detector(form, user_id, progress=lambda event, data: events.put((event, data)))
+        finally:
+            _stream_slots.release()
+            events.put(('result', result))
 
-            # Validate content length
-            if len(content.strip()) < 50:
-                return jsonify({'error':'Please provide more content for analysis (minimum 50 characters).'})
+    try:
+        _stream_executor.submit(run)
+    except Exception:
+        _stream_slots.release()
+        raise
+
+    def generate():
+        while True:
+            try:
+                event, data = events.get(timeout=15)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+
+            if event == 'result':
+                yield stream_result_message(data)
+                return
+            yield sse_message(event, data)
+
+    return sse_response(generate())
+
+def stream_job_events(job_id):
+    """Relay a queued job's progress events, then its result, as SSE messages."""
+    yield sse_message('queued', {
+        'job_id': job_id,
+        'status_url': url_for('detector_job_status', job_id=job_id)
+    })
+    attempt, seen = None, 0
+    last_sent = time.monotonic()
+    while True:
+        job = job_queue.get(job_id)
+        if job is None:
+            yield sse_message('error', {'error': 'Error processing your request. Please try again.'})
+            return
+        if job['attempts'] != attempt:
+            # A retry starts a new progress log
+            attempt, seen = job['attempts'], 0
+        for event, data in job['progress'][seen:]:
+            yield sse_message(event, data)
+            last_sent = time.monotonic()
+        seen = len(job['progress'])
+
+        if job['status'] == 'done':
+            yield stream_result_message(job['result'])
+            return
+        if job['status'] == 'failed':
+            yield sse_message('error', {'error': 'Error processing your request. Please try again.'})
+            return
+        if time.monotonic() - last_sent >= 15:
+            yield ': keepalive\n\n'
+            last_sent = time.monotonic()
+        time.sleep(JOB_STREAM_POLL_SECONDS)
+
+def stream_result_message(result):
+    """Final SSE message for a pipeline result: done (with redirect_url) or error."""
+    if 'error' in result:
+        return sse_message('error', {'error': result['error']})
+    scanned = 1 if result.get('existing_date') else None
+    return sse_message('done', {
+        'redirect_url': url_for('results', article_id=result['article_id'], scanned=scanned)
+    })
+
+def sse_response(messages):
+    return Response(
+        stream_with_context(messages),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def sse_message(event, data):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def scanned_message(article_id, date_str):
+    """Notice shown on the results page when the user already scanned an article."""
+    link = url_for('history') + f"#article-{article_id}"
+    return (
+        f'This article was scanned on '
+        f'<a href="{link}" class="date-link" target="_blank">{date_str}</a>'
+    )
+
+def detector_reply(result):
+    """Turn a pipeline result into the JSON payload the detector page expects."""
+    if 'error' in result:
+        return {'error': result['error']}
+
+    if result.get('existing_date'):
+        session['message'] = scanned_message(result['article_id'], result['existing_date'])
+    else:
+        session.pop('message', None)
+    return {'redirect_url': url_for('results', article_id=result['article_id'])}
+
+def detector_flight_key(form, user_id):
+    """Identity of a submission: same user, same source and same title choice."""
+    input_type = form.get('input-type')
+    if input_type == 'link':
+        source = normalize_url(form.get('article-link'))
+    else:
+        source = content_digest(form.get('article-snippet') or '')
+    return (user_id, input_type, source,
+            form.get('title-input-method'), (form.get('article-title') or '').strip())
+
+def run_detector(form, user_id, progress=None):
+    """
+    Runs the detector pipeline, attaching to an identical submission by the
+    same user if one is already running. Arguments and result are as for
+    run_detector_pipeline.
+    """
+    result, _ = detector_flights.do(
+        detector_flight_key(form, user_id),
+        lambda notify: stage_metrics.measured('pipeline', run_detector_pipeline, form, user_id, progress=notify),
+        listener=progress
+    )
+    return result
+
+def run_detector_pipeline(form, user_id, progress=None):
+    """
+    Runs the full detector pipeline for one submission.
+
+    `form` holds the detector form fields. Returns {'article_id': ...} (plus
+    'existing_date' when the user already scanned this article) on success, or
+    {'error': ...} where 'retryable' marks failures worth retrying. Does not
+    touch the Flask session, so it can run outside a request.
+
+    If given, progress(event, data) is called as each stage completes.
+    """
+    emit = progress or (lambda event, data: None)
+    try:
+        input_type       = form.get('input-type')
+        title_method     = form.get('title-input-method')
+        manual_title     = form.get('article-title')
+        content, source_url, page_title = '', None, None
+        title = 'No Title'
+
+        # Title handling
+        if title_method == 'manual':
+            if not manual_title:
+                return {'error':'Please enter the article title.'}
+            title = manual_title.strip()
+        elif title_method != 'automatic':
+            return {'error':'Please select a title input method.'}
+
+        # Content extraction
+        if input_type == 'link':
+            url = form.get('article-link')
+            if not url:
+                return {'error':'Please enter a valid URL.'}
+            try:
+                with stage_metrics.timed('extract'):
+                    fetched = fetch_article(url)
+                content = fetched.text
+                source_url = url
+                page_title = fetched.title
+                if not content:
+                    raise ValueError("No content extracted from URL")
+            except Exception as e:
+                app.logger.error(f"URL extraction error: {e}")
+                return {'error':'Failed to extract content from the URL. Please check if the URL is accessible.', 'retryable': True}
+        elif input_type == 'snippet':
+            snippet = form.get('article-snippet')
+            if not snippet:
+                return {'error':'Please enter an article snippet.'}
+            content = snippet.strip()
+        else:
+            return {'error':'Please select an input method (Link or Snippet).'}
+
+        # Validate content length
+        if len(content.strip()) < 50:
+            return {'error':'Please provide more content for analysis (minimum 50 characters).'}
+        emit('fetched', {'input_type': input_type, 'characters': len(content), 'page_title': page_title})
+
+        # Shared analysis cache: content already analyzed for any user is reused
+        # without calling Gemini at all
+        with stage_metrics.timed('analysis_cache'):
+            cached = analysis_cache.get(content)
+
+        # Near-duplicates (re-formatted or syndicated copies of an analyzed
+        # article) reuse that article's analysis. The texts may differ by up to
+        # the similarity threshold, so unlike exact cache hits they still go
+        # through the political and safety gates.
+        signature = None
+        reused = None
+        if not cached and NEAR_DUPLICATE_ENABLED:
+            with stage_metrics.timed('near_duplicate'):
+                signature = near_duplicates.signature(content)
+                match = find_near_duplicate(signature, user_id)
+            if match and match['user_id'] == user_id:
+                return {
+                    'article_id': match['id'],
+                    'existing_date': match['analysis_date'].strftime('%Y-%m-%d %H:%M:%S')
+                }
+            if match:
+                reused = {
+                    'title': None,
+                    'summary': match['summary'],
+                    'factuality_score': match['factuality_score'],
+                    'factuality_level': match['factuality_level'],
+                    'factuality_description': match['factuality_description'],
+                    'factuality_breakdown': match['factuality_breakdown']
+                }
+
+        # Bundled analysis: a single Gemini call covering every stage. Falls
+        # back to the per-stage calls when the reply is not valid JSON, and is
+        # skipped for long articles, which need the chunked analysis.
+        use_bundle = (ANALYSIS_BUNDLE_MODE and not cached and not reused
+                      and estimate_tokens(content) <= CHUNK_TOKEN_BUDGET)
+        bundle = stage_metrics.measured('bundle', analyze_bundle, content) if use_bundle else None
+        if cached:
+            emit('political', {'passed': True})
+            emit('safety', {'passed': True})
+            if title_method == 'automatic':
+                title = page_title or cached['title'] or stage_metrics.measured(
+                    'title', generate_article_title, content, input_type
+                )
+        elif bundle:
+            emit('political', {'passed': bundle['political']})
+            if not bundle['political']:
+                return {'error':'non_political'}
+            emit('safety', {'passed': bundle['safe']})
+            if not bundle['safe']:
+                return {'error':'explicit_content'}
+            if title_method == 'automatic':
+                title = page_title or bundle['title']
+        else:
+            # Title, political and safety checks (run concurrently unless disabled).
+            # A scraped page title makes the title check unnecessary.
+            needs_title = title_method == 'automatic' and not page_title
+            checks = GateChecks(content, input_type, with_title=needs_title)
 
             # Political check
             try:
-                if not is_political_article(content):
-                    return jsonify({'error':'non_political'})
+                political = checks.result('political')
+                emit('political', {'passed': bool(political)})
+                if not political:
+                    return {'error':'non_political'}
+            except LLMUnavailableError:
+                raise
             except Exception as e:
-                current_app.logger.error(f"Political check error: {e}")
-                return jsonify({'error':'Error checking article content. Please try again.'})
-            
+                app.logger.error(f"Political check error: {e}")
+                return {'error':'Error checking article content. Please try again.', 'retryable': True}
+
             # Safety check
             try:
-                if not is_content_safe(content):
-                    return jsonify({'error':'explicit_content'})
+                safe = checks.result('safety')
+                emit('safety', {'passed': bool(safe)})
+                if not safe:
+                    return {'error':'explicit_content'}
+            except LLMUnavailableError:
+                raise
             except Exception as e:
-                current_app.logger.error(f"Safety check error: {e}")
-                return jsonify({'error':'Error checking content safety. Please try again.'})
+                app.logger.error(f"Safety check error: {e}")
+                return {'error':'Error checking content safety. Please try again.', 'retryable': True}
 
-            # Duplicate check - be more thorough
-            try:
-                existing = get_existing_article(db_manager, title, content, source_url)
-                if existing:
-                    dt = existing['analysis_date'].strftime('%Y-%m-%d %H:%M:%S')
-                    link = url_for('history') + f"#article-{existing['id']}"
-                    session['message'] = (
-                        f'This article was scanned on '
-                        f'<a href="{link}" class="date-link" target="_blank">{dt}</a>'
-                    )
-                    article_id = existing['id']
-                else:
-                    session.pop('message', None)
-                    
-                    # Generate summary
-                    try:
+            # Automatic title
+            if title_method == 'automatic':
+                title = page_title or checks.result('title')
+
+            wall, saved = checks.time_saved()
+            app.logger.info(
+                f"Gate checks finished in {wall:.2f}s "
+                f"({'concurrent' if checks.concurrent else 'sequential'}, {saved:.2f}s saved)"
+            )
+        emit('title', {'title': title})
+
+        # Duplicate check - be more thorough
+        try:
+            with stage_metrics.timed('existing_lookup'):
+                existing = get_existing_article(db_manager, title, content, source_url, user_id=user_id)
+            if existing:
+                return {
+                    'article_id': existing['id'],
+                    'existing_date': existing['analysis_date'].strftime('%Y-%m-%d %H:%M:%S')
+                }
+
+            analysis = cached or reused
+            if analysis:
+                summary = analysis['summary']
+                f_score, f_level, f_desc, f_breakdown = (
+                    analysis['factuality_score'], analysis['factuality_level'],
+                    analysis['factuality_description'], analysis['factuality_breakdown']
+                )
+                emit('summary', {'summary': summary})
+            elif bundle:
+                summary = bundle['summary']
+                f_score, f_level, f_desc, f_breakdown = (
+                    bundle['score'], bundle['level'], bundle['description'], bundle['breakdown']
+                )
+                emit('summary', {'summary': summary})
+            else:
+                # Factuality runs in the background while the summary is generated,
+                # so the summary can be shown as soon as it is ready
+                factuality = submit_analysis_task('factuality', analyze_factuality, content)
+
+                # Generate summary
+                try:
+                    with stage_metrics.timed('summary'):
                         summary = generate_summary(content)
-                        if summary is None:
-                            return jsonify({'error':'explicit_content'})
-                    except Exception as e:
-                        current_app.logger.error(f"Summary generation error: {e}")
-                        return jsonify({'error':'Error generating summary. Please try again.'})
-
-                    # Factuality analysis
-                    try:
-                        f_score, f_level, f_desc, f_breakdown = analyze_factuality(content)
-                    except Exception as e:
-                        current_app.logger.error(f"Factuality analysis error: {e}")
-                        return jsonify({'error':'Error analyzing content. Please try again.'})
-                    
-                    # Double-check for duplicates before inserting (race condition protection)
-                    existing_check = get_existing_article(db_manager, title, content, source_url)
-                    if existing_check:
-                        article_id = existing_check['id']
-                    else:
-                        data = {
-                            'title': title,
-                            'link': source_url,
-                            'content': content,
-                            'summary': summary,
-                            'input_type': input_type,
-                            'factuality_score': f_score,
-                            'factuality_level': f_level,
-                            'factuality_description': f_desc,
-                            'factuality_breakdown': f_breakdown
-                        }
-                        try:
-                            article_id = db_manager.insert_article(data)
-                            if not article_id:
-                                raise ValueError("Failed to insert article")
-                        except Exception as e:
-                            current_app.logger.error(f"Database insertion error: {e}")
-                            return jsonify({'error':'Error saving article. Please try again.'})
-
-                return jsonify({'redirect_url': url_for('results', article_id=article_id)})
-                
+                    if summary is None:
+                        return {'error':'explicit_content'}
+                except LLMUnavailableError:
+                    raise
+                except Exception as e:
+                    app.logger.error(f"Summary generation error: {e}")
+                    return {'error':'Error generating summary. Please try again.', 'retryable': True}
+                emit('summary', {'summary': summary})
+
+                # Factuality analysis
+                try:
+                    f_score, f_level, f_desc, f_breakdown = factuality.result()
+                except LLMUnavailableError:
+                    raise
+                except Exception as e:
+                    app.logger.error(f"Factuality analysis error: {e}")
+                    return {'error':'Error analyzing content. Please try again.', 'retryable': True}
+
+            emit('factuality', {'score': f_score, 'level': f_level, 'description': f_desc})
+            for number, explanation in enumerate(f_breakdown, 1):
+                emit('breakdown', {'number': number, 'explanation': explanation})
+
+            if not analysis:
+                analysis_cache.put(content, {
+                    # Manual titles belong to the submitting user, so only share generated ones
+                    'title': title if title_method == 'automatic' else None,
+                    'summary': summary,
+                    'factuality_score': f_score,
+                    'factuality_level': f_level,
+                    'factuality_description': f_desc,
+                    'factuality_breakdown': f_breakdown
+                })
+
+            # Double-check for duplicates before inserting (race condition protection)
+            with stage_metrics.timed('existing_recheck'):
+                existing_check = get_existing_article(db_manager, title, content, source_url, user_id=user_id)
+            if existing_check:
+                return {'article_id': existing_check['id']}
+
+            data = {
+                'title': title,
+                'link': source_url,
+                'content': content,
+                'summary': summary,
+                'input_type': input_type,
+                'factuality_score': f_score,
+                'factuality_level': f_level,
+                'factuality_description': f_desc,
+                'factuality_breakdown': f_breakdown,
+                'user_id': user_id
+            }
+            try:
+                with stage_metrics.timed('insert'):
+                    article_id = db_manager.insert_article(data)
+                if not article_id:
+                    raise ValueError("Failed to insert article")
             except Exception as e:
-                current_app.logger.error(f"General processing error: {e}")
-                return jsonify({'error':'Error processing your request. Please try again.'})
+                app.logger.error(f"Database insertion error: {e}")
+                return {'error':'Error saving article. Please try again.', 'retryable': True}
+
+            if NEAR_DUPLICATE_ENABLED:
+                near_duplicates.add(article_id, content, user_id, signature=signature)
 
+            return {'article_id': article_id}
+
+        except LLMUnavailableError:
+            raise
         except Exception as e:
-            current_app.logger.error(f"Unexpected error in detector route: {e}")
-            return jsonify({'error':'An unexpected error occurred. Please try again.'})
+            app.logger.error(f"General processing error: {e}")
+            return {'error':'Error processing your request. Please try again.', 'retryable': True}
 
-    return render_template('detector.html', active_page=active_page)
+    except LLMUnavailableError as e:
+        app.logger.warning(f"Gemini unavailable: {e}")
+        return {'error': LLM_UNAVAILABLE_MESSAGE, 'retryable': True}
+    except Exception as e:
+        app.logger.error(f"Unexpected error in detector pipeline: {e}")
+        return {'error':'An unexpected error occurred. Please try again.', 'retryable': True}
+
+def find_near_duplicate(signature, user_id):
+    """
+    Returns the stored article data (with user_id) of the closest indexed
+    near-duplicate above the threshold, preferring the user's own articles.
+    """
+    if signature is None:
+        return None
+    matches = near_duplicates.query(signature=signature)
+    if not matches:
+        return None
+    own = [m for m in matches if m[1] == user_id]
+    article_id, owner_id, similarity = (own or matches)[0]
+    article = db_manager.get_full_article_data(article_id)
+    if not article:
+        near_duplicates.remove(article_id)
+        return None
+    app.logger.info(f"Near-duplicate of article {article_id} found (similarity {similarity:.2f})")
+    article['user_id'] = owner_id
+    return article
+
+@app.route('/batch', methods=['POST'])
+@login_required
+def batch_analyze():
+    """
+    Analyze a JSONL/CSV batch of URLs or snippets (uploaded as `file` or sent
+    as the request body). Streams one JSON line per finished item.
+    """
+    upload = request.files.get('file')
+    try:
+        if upload:
+            text = upload.read().decode('utf-8')
+        else:
+            text = request.get_data(as_text=True)
+        fmt = request.args.get('format')
+        if not fmt and upload and upload.filename:
+            fmt = 'csv' if upload.filename.lower().endswith('.csv') else 'jsonl'
+        items = parse_batch(text, fmt)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'Invalid batch: {e}'}), 400
+    if not items:
+        return jsonify({'error': 'The batch is empty.'}), 400
+
+    user_id = session.get('user_id')
+    parallelism = request.args.get('parallelism', BATCH_DEFAULT_PARALLELISM, type=int)
+
+    def generate():
+        for record in run_batch(items, user_id, run_detector, parallelism):
+            yield json.dumps(record) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def process_detector_job(payload, user_id, progress=None):
+    """Job handler: runs the pipeline and asks for a retry on transient errors."""
+    result = run_detector(payload, user_id, progress)
+    if result.get('retryable'):
+        raise RetryableJobError(result['error'], {'error': result['error']})
+    return result
+
+job_queue = JobQueue()
+job_workers = JobWorkerPool(job_queue, process_detector_job)
+# Start at boot so jobs queued before a restart (or whose worker died) resume
+# without waiting for a new submission
+if ASYNC_DETECTOR_JOBS:
+    job_workers.start()
 
 @app.route('/results/<int:article_id>')
 @login_required
@@ -234,6 +675,9 @@ def results(article_id):
         return "Article not found", 404
 
     message = session.pop('message', None)
+    if not message and request.args.get('scanned') and art['analysis_date']:
+        # Streamed submissions cannot set the session, so they flag duplicates here
+        message = scanned_message(article_id, art['analysis_date'].strftime('%Y-%m-%d %H:%M:%S'))
 
     if art['input_type']=='link' and art['link']:
         p = urlparse(art['link'])
@@ -267,15 +711,32 @@ def history():
 @app.route('/get_articles')
 @login_required
 def get_articles():
-    """Get articles for the current logged-in user with pagination and filtering."""
+    """
+    Get articles for the current logged-in user with pagination and filtering.
+    
+    Pass the previous response's next_cursor as `cursor` to fetch the next
+    page without OFFSET; `page` still works for older clients. Totals are
+    returned for page requests, and for cursor requests only with
+    include_total=true.
+    """
     try:
         # Get pagination parameters
         page = request.args.get('page', 1, type=int)
         items_per_page = request.args.get('items_per_page', 50, type=int)
         include_breakdowns = request.args.get('include_breakdowns', 'false').lower() == 'true'
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'false' if cursor else 'true').lower() == 'true'
         
         # Limit items per page to prevent abuse
-        items_per_page = min(items_per_page, 1000)
+        items_per_page = max(1, min(items_per_page, 1000))
+        page = max(1, page)
+        
+        after_id = None
+        if cursor:
+            try:
+                after_id = decode_cursor(cursor)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
         
         # Get current user ID from session
         user_id = session.get('user_id')
@@ -288,7 +749,9 @@ def get_articles():
                 user_id=user_id,
                 page=page,
                 items_per_page=items_per_page,
-                include_breakdowns=include_breakdowns
+                include_breakdowns=include_breakdowns,
+                after_id=after_id,
+                include_total=include_total
             )
             
             if not articles_data:
@@ -297,7 +760,8 @@ def get_articles():
                     'total': 0,
                     'page': page,
                     'items_per_page': items_per_page,
-                    'total_pages': 0
+                    'total_pages': 0,
+                    'next_cursor': None
                 })
             
             # Format articles for frontend
@@ -323,13 +787,17 @@ def get_articles():
             response_data = {
                 'articles': formatted_articles,
                 'total': articles_data['total'],
-                'page': page,
+                'page': None if cursor else page,
                 'items_per_page': items_per_page,
-                'total_pages': articles_data['total_pages']
+                'total_pages': articles_data['total_pages'],
+                'next_cursor': articles_data['next_cursor']
             }
             
             return jsonify(response_data)
             
+        except ValueError:
+            # The cursor decoded but is not one of this user's articles
+            return jsonify({'error': 'Invalid cursor'}), 400
         except Exception as e:
             current_app.logger.error(f"Database error in get_articles: {e}")
             return jsonify({'error': 'Database error occurred'}), 500
@@ -438,19 +906,66 @@ def view_feedback():
                          feedback_entries=feedback_entries,
                          active_page='admin')
 
+@app.route('/admin/pipeline_stats')
+@login_required
+def pipeline_stats():
+    """JSON counters for the detector pipeline's fast paths and caches."""
+    return jsonify({
+        'political_classifier': political_classifier.stats(),
+        'content_screen': content_screen.stats(),
+        'single_flight': detector_flights.stats(),
+        'stages': stage_metrics.snapshot(),
+        'llm': llm.stats(),
+        'llm_cache': llm.reply_cache.stats(),
+        'llm_hedging': llm.hedge_stats(),
+        'analysis_cache': analysis_cache.stats(),
+    })
+
 # === Analysis Helpers ===
 def generate_summary(text):
+    try:
+        # Map: summarize chunks in parallel. Reduce: summarize the summaries,
+        # in further rounds should they still exceed the budget. Rounds run on
+        # this thread; chunk workers never chunk or submit work themselves.
+        while estimate_tokens(text) > CHUNK_TOKEN_BUDGET:
+            partials = list(_chunk_executor.map(summarize_chunk, chunk_text(text, CHUNK_TOKEN_BUDGET)))
+            if not partials or any(p is None for p in partials):
+                return None
+            reduced = "\n\n".join(partials)
+            if len(reduced) >= len(text):
+                return None
+            text = reduced
+        return summarize_chunk(text)
+    except LLMUnavailableError:
+        raise
+    except:
+        return None
+
+def summarize_chunk(text):
+    """One summary call for text within the chunk token budget."""
     try:
         prompt = (
             "Please provide a concise summary (max 4 sentences) of the following text:\n\n" + text
         )
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        resp  = model.generate_content(prompt)
-        return resp.text.strip()
+        return llm.generate(prompt, stage='summary').strip()
+    except LLMUnavailableError:
+        raise
     except:
         return None
 
 def analyze_factuality(text):
+    if estimate_tokens(text) <= CHUNK_TOKEN_BUDGET:
+        return analyze_chunk_factuality(text)
+    try:
+        return analyze_long_factuality(text)
+    except LLMUnavailableError:
+        raise
+    except Exception as e:
+        print(f"Error in analyze_factuality: {e}")
+        return default_factuality_result()
+
+def analyze_chunk_factuality(text):
+    """One factuality call for text within the chunk token budget."""
     try:
         prompt = (
             "Analyze the factual accuracy of the following Philippine political news text and assign a score from 0-100%.\n\n"
@@ -466,45 +981,177 @@ def analyze_factuality(text):
             "Reference actual claims in the text and explain whether they are verifiable, misleading, or false.\n\n"
             f"Text to analyze:\n{text}"
         )
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        resp  = model.generate_content(prompt).text.replace('*','').strip()
+        resp = llm.generate(prompt, stage='factuality')
+        return parse_factuality_response(resp, text)
 
-        m = re.search(r'Factuality Level:\s*(.+?)\s*\((\d{1,3})%\)', resp)
-        if m:
-            level, score = m.group(1).strip(), int(m.group(2))
-        else:
-            level, score = 'Unknown', 50
-
-        score = max(0, min(score, 100))
-        level = classify_factuality(score)
-        desc  = get_factuality_description(score)
-
-        breakdown = []
-        b_match = re.search(r'Breakdown:\s*(.*)', resp, re.DOTALL)
-        if b_match:
-            text_b = b_match.group(1).strip()
-            items = re.findall(r'^\d+\.\s*(.+?)(?=\n\d+\.|$)', text_b, re.MULTILINE|re.DOTALL)
-            for i, item in enumerate(items[:5], start=1):
-                # Clean up and ensure the explanation is detailed
-                explanation = item.strip()
-                if explanation and len(explanation) > 10:  # Only include substantial explanations
-                    breakdown.append(explanation)
-        
-        # If no good breakdown was extracted, create score-specific explanations
-        if not breakdown:
-            breakdown = generate_score_specific_breakdown(score, text[:200])
+    except LLMUnavailableError:
+        raise
+    except Exception as e:
+        print(f"Error in analyze_chunk_factuality: {e}")
+        return default_factuality_result()
+
+def default_factuality_result():
+    d = get_factuality_description(50)
+    breakdown = [
+        "Unable to perform detailed analysis due to technical error",
+        "Default scoring applied based on general content assessment",
+        "Manual review recommended for accurate fact-checking"
+    ]
+    return 50, 'Unknown', d, breakdown
 
-        return score, level, desc, breakdown
+def analyze_long_factuality(text):
+    """
+    Map-reduce factuality analysis for text over the chunk token budget.
 
+    Each chunk is fact-checked in parallel, then one reduce call merges the
+    per-chunk findings into the final score and 5-point breakdown. If the
+    reduce reply has no score, the length-weighted chunk average is used.
+    """
+    chunks = chunk_text(text, CHUNK_TOKEN_BUDGET)
+    partials = list(_chunk_executor.map(analyze_chunk_factuality, chunks))
+
+    weighted_score = round(
+        sum(p[0] * len(c) for p, c in zip(partials, chunks)) / max(1, sum(len(c) for c in chunks))
+    )
+    findings = "\n\n".join(
+        f"Section {i} of {len(chunks)} - score {score}%:\n" + "\n".join(f"- {b}" for b in breakdown)
+        for i, (score, _, _, breakdown) in enumerate(partials, start=1)
+    )
+    prompt = (
+        "The following are fact-check findings for consecutive sections of one Philippine political news article. "
+        "Combine them into an overall assessment of the whole article and assign a score from 0-100%.\n\n"
+        "Please provide your analysis in this exact format:\n"
+        "Factuality Level: [Level] ([Score]%)\n\n"
+        "Breakdown:\n"
+        "1. [Specific reason explaining why this score was given - mention specific claims, sources, or lack thereof]\n"
+        "2. [Another specific factor that contributed to this score - cite verifiable facts or misinformation]\n"
+        "3. [Additional evidence or red flags that influenced the scoring]\n"
+        "4. [Source credibility assessment if applicable]\n"
+        "5. [Overall conclusion explaining the final score]\n\n"
+        "Weigh longer sections and serious misinformation more heavily.\n\n"
+        f"Section findings:\n{findings}"
+    )
+    try:
+        resp = llm.generate(prompt, stage='factuality')
+        return parse_factuality_response(resp, text, default_score=weighted_score)
+    except LLMUnavailableError:
+        raise
     except Exception as e:
-        print(f"Error in analyze_factuality: {e}")
-        d = get_factuality_description(50)
-        breakdown = [
-            "Unable to perform detailed analysis due to technical error",
-            "Default scoring applied based on general content assessment",
-            "Manual review recommended for accurate fact-checking"
-        ]
-        return 50, 'Unknown', d, breakdown
+        print(f"Error reducing factuality analysis: {e}")
+        breakdown = [b for p in partials for b in p[3]][:5]
+        return (weighted_score, classify_factuality(weighted_score),
+                get_factuality_description(weighted_score), breakdown)
+
+def parse_factuality_response(resp, text, default_score=50):
+    """Extract (score, level, description, breakdown) from a factuality reply."""
+    resp = resp.replace('*','').strip()
+
+    m = re.search(r'Factuality Level:\s*(.+?)\s*\((\d{1,3})%\)', resp)
+    if m:
+        level, score = m.group(1).strip(), int(m.group(2))
+    else:
+        level, score = 'Unknown', default_score
+
+    score = max(0, min(score, 100))
+    level = classify_factuality(score)
+    desc  = get_factuality_description(score)
+
+    breakdown = []
+    b_match = re.search(r'Breakdown:\s*(.*)', resp, re.DOTALL)
+    if b_match:
+        text_b = b_match.group(1).strip()
+        items = re.findall(r'^\d+\.\s*(.+?)(?=\n\d+\.|$)', text_b, re.MULTILINE|re.DOTALL)
+        for i, item in enumerate(items[:5], start=1):
+            # Clean up and ensure the explanation is detailed
+            explanation = item.strip()
+            if explanation and len(explanation) > 10:  # Only include substantial explanations
+                breakdown.append(explanation)
+    
+    # If no good breakdown was extracted, create score-specific explanations
+    if not breakdown:
+        breakdown = generate_score_specific_breakdown(score, text[:200])
+
+    return score, level, desc, breakdown
+
+def analyze_bundle(text):
+    """
+    Runs every analysis stage in one Gemini call that returns JSON.
+
+    Returns a dict with political, safe, title, summary, score, level,
+    description and breakdown, or None if the reply is missing or does not
+    match the expected schema (the caller then falls back to the per-stage calls).
+    """
+    try:
+        prompt = (
+            "You are analyzing a submission for a Philippine political news fact-checker.\n\n"
+            "Return a single JSON object with exactly these keys:\n"
+            '  "political": true if the text is about current political news in the Philippines, otherwise false\n'
+            '  "safe": false if the text contains explicit or harmful content, otherwise true\n'
+            '  "title": a single concise and descriptive title for the text\n'
+            '  "summary": a concise summary of the text (max 4 sentences)\n'
+            '  "score": an integer from 0 to 100 rating the factual accuracy of the text\n'
+            '  "breakdown": a list of 5 strings, each a specific reason why this score was given - '
+            "reference actual claims in the text and explain whether they are verifiable, misleading, or false, "
+            "assess source credibility, and end with an overall conclusion\n\n"
+            "Respond with the JSON object only.\n\n"
+            f"Text to analyze:\n{text}"
+        )
+        resp = llm.generate(
+            prompt, stage='bundle', generation_config={'response_mime_type': 'application/json'}
+        )
+        return parse_analysis_bundle(resp, text)
+    except LLMUnavailableError:
+        raise
+    except Exception as e:
+        print(f"Error in analyze_bundle: {e}")
+        return None
+
+def parse_analysis_bundle(raw, text=''):
+    """Validates a bundled analysis reply. Returns the normalized dict or None."""
+    raw = (raw or '').strip()
+    if raw.startswith('```'):
+        raw = raw.split('\n', 1)[1] if '\n' in raw else ''
+    if raw.endswith('```'):
+        raw = raw[:-3]
+
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    if not isinstance(data.get('political'), bool) or not isinstance(data.get('safe'), bool):
+        return None
+    title, summary = data.get('title'), data.get('summary')
+    if not isinstance(title, str) or not isinstance(summary, str):
+        return None
+    score = data.get('score')
+    if isinstance(score, bool) or not isinstance(score, (int, float)):
+        return None
+    breakdown = data.get('breakdown')
+    if not isinstance(breakdown, list) or not all(isinstance(b, str) for b in breakdown):
+        return None
+
+    # Only the gate flags matter for rejected submissions
+    if data['political'] and data['safe'] and not summary.strip():
+        return None
+
+    score = max(0, min(int(round(score)), 100))
+    breakdown = [b.strip() for b in breakdown[:5] if len(b.strip()) > 10]
+    if not breakdown:
+        breakdown = generate_score_specific_breakdown(score, text[:200])
+
+    return {
+        'political': data['political'],
+        'safe': data['safe'],
+        'title': title.split('\n')[0].strip().strip('"').strip("'").strip() or 'No Title',
+        'summary': summary.strip(),
+        'score': score,
+        'level': classify_factuality(score),
+        'description': get_factuality_description(score),
+        'breakdown': breakdown
+    }
 
 def generate_score_specific_breakdown(score, text_preview):
     """Generate score-specific breakdown explanations when AI doesn't provide detailed analysis."""
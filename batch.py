@@ -0,0 +1,170 @@
+"""
+Bulk analysis for TruthGuard.
+
+Accepts JSONL or CSV batches of URLs and/or snippets, runs every item through
+the regular detector pipeline with configurable parallelism and yields one
+JSON-serializable status record per item as soon as it finishes. Used by the
+/batch endpoint and by the command line:
+
+    python batch.py links.jsonl --user alice --parallelism 8 --output results.jsonl
+
+Each JSONL line (or CSV row) has either `url` or `snippet`, plus an optional
+`title`; items without a title get an automatic one. Batches of more than
+BATCH_MAX_ITEMS items are rejected rather than truncated.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from fetcher import prefetch_pages
+
+BATCH_DEFAULT_PARALLELISM = int(os.getenv('BATCH_DEFAULT_PARALLELISM', '4'))
+BATCH_MAX_PARALLELISM = int(os.getenv('BATCH_MAX_PARALLELISM', '16'))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '1000'))
+
+ITEM_TEXT_FIELDS = ('url', 'snippet', 'title')
+
+
+def parse_batch(text, fmt=None):
+    """
+    Parse a JSONL or CSV batch into a list of item dicts.
+
+    The format is detected from the first non-blank character when not given.
+    Raises ValueError for unparseable input, items whose url/snippet/title are
+    not strings, and batches larger than BATCH_MAX_ITEMS.
+    """
+    text = text.lstrip('\ufeff')
+    if fmt is None:
+        fmt = 'jsonl' if text.lstrip().startswith('{') else 'csv'
+
+    if fmt == 'jsonl':
+        items = []
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Line {line_no}: invalid JSON ({e})")
+            if not isinstance(item, dict):
+                raise ValueError(f"Line {line_no}: expected a JSON object")
+            for field in ITEM_TEXT_FIELDS:
+                if item.get(field) is not None and not isinstance(item[field], str):
+                    raise ValueError(f"Line {line_no}: '{field}' must be a string")
+            items.append(item)
+    elif fmt == 'csv':
+        reader = csv.DictReader(io.StringIO(text))
+        items = [{k.strip().lower(): (v or '').strip() for k, v in row.items() if k} for row in reader]
+    else:
+        raise ValueError(f"Unsupported batch format: {fmt}")
+
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f"{len(items)} items exceed the limit of {BATCH_MAX_ITEMS} per batch")
+    return items
+
+
+def item_to_form(item):
+    """Map a batch item onto the detector form fields."""
+    title = (item.get('title') or '').strip()
+    form = {
+        'title-input-method': 'manual' if title else 'automatic',
+        'article-title': title,
+    }
+    if item.get('url'):
+        form['input-type'] = 'link'
+        form['article-link'] = item['url'].strip()
+    else:
+        form['input-type'] = 'snippet'
+        form['article-snippet'] = item.get('snippet') or ''
+    return form
+
+
+def run_batch(items, user_id, pipeline, parallelism=BATCH_DEFAULT_PARALLELISM):
+    """
+    Run `pipeline(form, user_id)` for every item and yield status records in
+    completion order: {'index', 'input', 'status', 'article_id' | 'error', 'seconds'}.
+    URLs are downloaded up front with newspaper's multi-threaded downloader.
+    """
+    parallelism = max(1, min(int(parallelism), BATCH_MAX_PARALLELISM))
+
+    urls = [item['url'].strip() for item in items if item.get('url')]
+    if urls:
+        try:
+            prefetch_pages(urls, threads=max(parallelism, 4))
+        except Exception as e:
+            print(f"Error prefetching batch URLs: {e}")
+
+    def process(index, item):
+        started = time.perf_counter()
+        record = {'index': index, 'input': item.get('url') or (item.get('snippet') or '')[:80]}
+        try:
+            result = pipeline(item_to_form(item), user_id)
+        except Exception as e:
+            result = {'error': f'Unexpected error: {e}'}
+        if 'error' in result:
+            record.update(status='error', error=result['error'])
+        else:
+            record.update(status='duplicate' if result.get('existing_date') else 'done',
+                          article_id=result['article_id'])
+        record['seconds'] = round(time.perf_counter() - started, 3)
+        return record
+
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='batch') as pool:
+        futures = [pool.submit(process, i, item) for i, item in enumerate(items)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze a batch of article URLs/snippets.')
+    parser.add_argument('input', help='JSONL or CSV file ("-" for stdin)')
+    parser.add_argument('--user', required=True, help='username or email that will own the articles')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='input format (detected if omitted)')
+    parser.add_argument('--parallelism', type=int, default=BATCH_DEFAULT_PARALLELISM)
+    parser.add_argument('--output', help='write JSONL results here instead of stdout')
+    args = parser.parse_args(argv)
+
+    # Imported here so that parsing --help does not need an API key
+    from app import run_detector
+    from database import get_user_by_username_or_email
+
+    user = get_user_by_username_or_email(args.user)
+    if not user:
+        print(f"User not found: {args.user}", file=sys.stderr)
+        return 1
+
+    if args.input == '-':
+        text = sys.stdin.read()
+    else:
+        with open(args.input, encoding='utf-8') as f:
+            text = f.read()
+    try:
+        items = parse_batch(text, args.format)
+    except ValueError as e:
+        print(f"Invalid batch: {e}", file=sys.stderr)
+        return 1
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    counts = {}
+    try:
+        for record in run_batch(items, user.id, run_detector, args.parallelism):
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+            counts[record['status']] = counts.get(record['status'], 0) + 1
+            print(f"[{sum(counts.values())}/{len(items)}] item {record['index']}: {record['status']}", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Finished: {counts}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,381 @@
+"""
+End-to-end latency benchmark for the detector.
+
+Drives the Flask app through its test client with the Gemini model objects
+and the page fetcher replaced by stubs, at several concurrency levels, and
+prints per-stage p50/p95/p99 plus end-to-end throughput as JSON so runs can
+be compared between releases.
+
+The stub model answers like an unconstrained model would (with trailing
+explanations), honours max_output_tokens and stop_sequences like Gemini, and
+takes a base latency plus a per-output-token cost. Runs with and without the
+per-stage generation budgets report output tokens per stage side by side.
+
+    python benchmarks/bench_detector.py --concurrency 1,4,16 --requests 64 > bench.json
+
+The app's own switches apply as usual, e.g. POLITICAL_CLASSIFIER_ENABLED=false
+or ANALYSIS_BUNDLE_MODE=true in the environment. Everything is written to a
+temporary directory; the real database is never touched.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What an unconstrained model tends to send back for each stage
+STUB_REPLIES = {
+    'political': (
+        'Yes\n\nThe text is about Philippine political news: it reports on senators, a Senate '
+        'hearing and the national budget, which are matters of current political interest in the '
+        'Philippines. The named officials are members of the Senate of the Philippines.'
+    ),
+    'safety': (
+        'Safe\n\nThe content is a straightforward news report. It contains no explicit, violent or '
+        'otherwise harmful material and is appropriate for a general audience.'
+    ),
+    'title': (
+        'Senate Opens Inquiry Into Proposed Budget\n\nThis title captures the main event described '
+        'in the article, the Senate inquiry, and the subject of the inquiry, the proposed budget. '
+        'Alternative titles could be "Senators Question Budget Allocations" or "Budget Hearing Heats Up".'
+    ),
+    'summary': (
+        'The Senate opened an inquiry into the proposed national budget. Several senators questioned '
+        'the allocation for confidential funds. Malacanang defended the proposal during the hearing. '
+        'The committee will continue deliberations next week. In addition, observers noted that the '
+        'debate reflects long-standing concerns about transparency in the use of public funds, and '
+        'several civil society groups have called for the publication of detailed expenditure reports.'
+    ),
+    'factuality': (
+        'Factuality Level: Mostly Factual (74%)\n\n'
+        'Breakdown:\n'
+        '1. The hearing date and participants match the official Senate calendar\n'
+        '2. Budget figures are consistent with the published National Expenditure Program\n'
+        '3. Quotes are attributed to named officials and can be verified\n'
+        '4. The outlet is an established news organization with a corrections policy\n'
+        '5. Minor framing issues keep the article from the highest rating\n'
+        '6. The article could benefit from additional independent sources\n'
+        '7. Readers may wish to consult the official Senate records\n\n'
+        'Overall, the article is a generally reliable account of the hearing, although some context '
+        'about earlier budget debates and the positions of the opposition is missing.'
+    ),
+    'bundle': json.dumps({
+        'political': True,
+        'safe': True,
+        'title': 'Senate Opens Inquiry Into Proposed Budget',
+        'summary': 'The Senate opened an inquiry into the proposed national budget.',
+        'score': 74,
+        'breakdown': [
+            'The hearing date and participants match the official Senate calendar',
+            'Budget figures are consistent with the published National Expenditure Program',
+            'Quotes are attributed to named officials and can be verified',
+            'The outlet is an established news organization with a corrections policy',
+            'Minor framing issues keep the article from the highest rating'
+        ]
+    }),
+}
+
+# Prompt markers identifying each stage (checked in order)
+_STAGE_MARKERS = [
+    ('bundle', 'Return a single JSON object'),
+    ('political', 'Is this about Philippine political news?'),
+    ('safety', 'Is this content safe?'),
+    ('title', 'Title:'),
+    ('factuality', 'Factuality Level'),
+    ('summary', 'concise summary'),
+]
+
+
+def stage_of(prompt):
+    for stage, marker in _STAGE_MARKERS:
+        if marker in prompt:
+            return stage
+    return 'unknown'
+
+
+def apply_generation_config(text, config):
+    """Cut a reply the way Gemini applies stop sequences and max_output_tokens."""
+    from text_utils import estimate_tokens
+
+    config = config or {}
+    for stop in config.get('stop_sequences') or []:
+        cut = text.find(stop)
+        if cut != -1:
+            text = text[:cut]
+    max_tokens = config.get('max_output_tokens')
+    if max_tokens and estimate_tokens(text) > max_tokens:
+        text = text[:max_tokens * 4]
+    return text
+
+
+_NAMES = ['Hontiveros', 'Zubiri', 'Escudero', 'Romualdez', 'Pimentel', 'Gatchalian', 'Villar', 'Tulfo']
+_VERBS = ['questioned', 'defended', 'filed', 'rejected', 'approved', 'amended', 'criticized', 'reviewed']
+_OBJECTS = ['the proposed budget', 'a bill on rice tariffs', 'the confidential funds', 'the Comelec report',
+            'a resolution on the West Philippine Sea', 'the Maharlika fund', 'the charter change proposal']
+_PLACES = ['in the Senate', 'at Malacañang', 'before the House of Representatives', 'in Quezon City',
+           'during a hearing in Manila', 'at a briefing in Davao']
+
+
+def make_snippet(rng):
+    """A unique, political-looking article so every request runs the full pipeline."""
+    sentences = [
+        f"Senator {rng.choice(_NAMES)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} {rng.choice(_PLACES)}"
+        f" on {rng.choice(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'])}, according to"
+        f" {rng.randint(2, 40)} lawmakers."
+        for _ in range(rng.randint(6, 12))
+    ]
+    sentences.append(f"Reference {uuid.uuid4().hex}.")
+    return ' '.join(sentences)
+
+
+def parse_stage_latencies(spec):
+    latencies = {}
+    for item in filter(None, (spec or '').split(',')):
+        stage, _, ms = item.partition('=')
+        latencies[stage.strip()] = float(ms)
+    return latencies
+
+
+class Stubs:
+    """Stub Gemini models and page fetcher with per-stage latency and jitter."""
+
+    def __init__(self, llm_latency_ms, stage_latency_ms, ms_per_token, fetch_latency_ms, jitter, seed):
+        self.llm_latency_ms = llm_latency_ms
+        self.stage_latency_ms = stage_latency_ms
+        self.ms_per_token = ms_per_token
+        self.fetch_latency_ms = fetch_latency_ms
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._output_tokens = {}
+
+    def _sleep(self, ms):
+        with self._lock:
+            factor = 1 + self._rng.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, ms * factor) / 1000)
+
+    def get_model(self, model, api_key_name='default'):
+        return StubModel(self, model)
+
+    def reply(self, prompt, generation_config):
+        from text_utils import estimate_tokens
+
+        stage = stage_of(prompt)
+        text = apply_generation_config(STUB_REPLIES.get(stage, ''), generation_config)
+        tokens = estimate_tokens(text)
+        with self._lock:
+            self._output_tokens.setdefault(stage, []).append(tokens)
+        self._sleep(self.stage_latency_ms.get(stage, self.llm_latency_ms) + tokens * self.ms_per_token)
+        return text
+
+    def output_tokens(self):
+        """Output tokens per stage since the last call, and reset."""
+        with self._lock:
+            counts, self._output_tokens = self._output_tokens, {}
+        return {
+            stage: {'calls': len(values), 'total': sum(values), 'mean': round(sum(values) / len(values), 1)}
+            for stage, values in sorted(counts.items())
+        }
+
+    def add_page(self, url, text):
+        with self._lock:
+            self._pages[url] = text
+
+    def fetch_page(self, url):
+        self._sleep(self.fetch_latency_ms)
+        with self._lock:
+            text = self._pages.get(url, '')
+        paragraphs = ''.join(f'<p>{s}.</p>' for s in text.split('. '))
+        return (
+            f'<html><head><title>Benchmark article</title></head>'
+            f'<body><article><h1>Benchmark article</h1>{paragraphs}</article></body></html>'
+        ), False
+
+
+class StubModel:
+    """Stands in for a pooled GenerativeModel."""
+
+    def __init__(self, stubs, model):
+        self.stubs = stubs
+        self.model_name = model
+
+    def generate_content(self, prompt, generation_config=None, request_options=None, **kwargs):
+        return types.SimpleNamespace(text=self.stubs.reply(prompt, generation_config))
+
+
+def load_app(stubs, workdir):
+    """Import the app against a scratch database with the stubs installed."""
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'truthguard.db')
+    os.environ['JOBS_DB_PATH'] = os.path.join(workdir, 'jobs.db')
+    os.environ['FETCH_CACHE_DIR'] = os.path.join(workdir, 'fetch_cache')
+    os.environ['RECORDINGS_DIR'] = os.path.join(workdir, 'recordings')
+    os.environ['LLM_CACHE_PATH'] = os.path.join(workdir, 'llm_cache.db')
+    os.environ['BACKEND_MODE'] = 'live'
+    os.environ['API_KEY'] = 'benchmark-stub'
+    os.environ['LLM_WARMUP'] = 'false'
+    # Measure the pipeline, not the outbound rate limit (unless asked to)
+    os.environ.setdefault('LLM_RATE_PER_MINUTE', '1000000')
+    os.environ.setdefault('LLM_BURST', '100000')
+    sys.path.insert(0, ROOT)
+
+    import fetcher
+    import llm
+    llm.get_model = stubs.get_model
+    fetcher.fetch_page = stubs.fetch_page
+
+    import app as app_module
+    from models import User
+
+    session = app_module.db_manager.get_session()
+    user = User(username='benchmark', email='benchmark@example.com')
+    user.set_password(uuid.uuid4().hex)
+    session.add(user)
+    session.commit()
+    user_id = user.id
+    session.close()
+
+    app_module.app.config['TESTING'] = True
+    return app_module, user_id
+
+
+def make_form(rng, stubs, input_type):
+    if input_type == 'mixed':
+        input_type = rng.choice(['snippet', 'link'])
+    text = make_snippet(rng)
+    form = {'input-type': input_type, 'title-input-method': 'automatic'}
+    if input_type == 'link':
+        url = f"https://news.example.ph/{uuid.uuid4().hex}"
+        stubs.add_page(url, text)
+        form['article-link'] = url
+    else:
+        form['article-snippet'] = text
+    return form
+
+
+def run_level(app_module, user_id, stubs, concurrency, total, input_type, seed, budgets):
+    """Send `total` submissions with `concurrency` clients; return the level's report."""
+    import model_routing
+    from metrics import stage_metrics, summarize
+
+    model_routing.GENERATION_BUDGETS_ENABLED = budgets
+
+    rng = random.Random(seed)
+    forms = [make_form(rng, stubs, input_type) for _ in range(total)]
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = app_module.app.test_client()
+            with local.client.session_transaction() as sess:
+                sess['user_id'] = user_id
+                sess['username'] = 'benchmark'
+        return local.client
+
+    def submit(form):
+        start = time.perf_counter()
+        reply = client().post('/detector', data=form)
+        elapsed = time.perf_counter() - start
+        body = reply.get_json(silent=True) or {}
+        return elapsed, reply.status_code == 200 and 'redirect_url' in body
+
+    stage_metrics.reset()
+    stubs.output_tokens()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(submit, forms))
+    wall = time.perf_counter() - started
+
+    latencies = [elapsed for elapsed, ok in outcomes if ok]
+    return {
+        'concurrency': concurrency,
+        'generation_budgets': budgets,
+        'requests': total,
+        'succeeded': len(latencies),
+        'errors': total - len(latencies),
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(len(latencies) / wall, 3) if wall else None,
+        'end_to_end': summarize(latencies),
+        'stages': stage_metrics.snapshot(),
+        'output_tokens': stubs.output_tokens()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', default='1,4,16',
+                        help="comma-separated concurrency levels (default: 1,4,16)")
+    parser.add_argument('--requests', type=int, default=48,
+                        help="submissions per concurrency level (default: 48)")
+    parser.add_argument('--input', choices=['snippet', 'link', 'mixed'], default='mixed',
+                        help="input type of the submissions (default: mixed)")
+    parser.add_argument('--llm-latency-ms', type=float, default=300,
+                        help="default base latency of one Gemini call (default: 300)")
+    parser.add_argument('--stage-latency', default='summary=400,factuality=600,bundle=700',
+                        help="per-stage base latency overrides, e.g. summary=400,factuality=600")
+    parser.add_argument('--ms-per-token', type=float, default=4,
+                        help="stub latency per output token (default: 4)")
+    parser.add_argument('--budgets', choices=['on', 'off', 'both'], default='both',
+                        help="run with the per-stage generation budgets on, off or both (default: both)")
+    parser.add_argument('--fetch-latency-ms', type=float, default=250,
+                        help="stub latency of one page download (default: 250)")
+    parser.add_argument('--jitter', type=float, default=0.2,
+                        help="relative +/- jitter applied to every stub latency (default: 0.2)")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    stubs = Stubs(args.llm_latency_ms, parse_stage_latencies(args.stage_latency), args.ms_per_token,
+                  args.fetch_latency_ms, args.jitter, args.seed)
+    budget_modes = {'on': [True], 'off': [False], 'both': [False, True]}[args.budgets]
+
+    # The app logs with print(); keep stdout for the report
+    with tempfile.TemporaryDirectory(prefix='truthguard-bench-') as workdir, \
+            contextlib.redirect_stdout(sys.stderr):
+        app_module, user_id = load_app(stubs, workdir)
+        # Distinct seeds per run so later runs don't hit articles stored by earlier ones
+        runs = [(budgets, level) for budgets in budget_modes for level in levels]
+        results = [
+            run_level(app_module, user_id, stubs, level, args.requests, args.input, args.seed + i, budgets)
+            for i, (budgets, level) in enumerate(runs)
+        ]
+
+    report = {
+        'benchmark': 'detector',
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'config': {
+            'input': args.input,
+            'requests_per_level': args.requests,
+            'llm_latency_ms': args.llm_latency_ms,
+            'stage_latency_ms': parse_stage_latencies(args.stage_latency),
+            'ms_per_token': args.ms_per_token,
+            'fetch_latency_ms': args.fetch_latency_ms,
+            'jitter': args.jitter,
+            'seed': args.seed
+        },
+        'results': results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
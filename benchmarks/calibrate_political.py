@@ -0,0 +1,84 @@
+"""
+Check the political classifier's thresholds against a labelled sample.
+
+Scores every text in benchmarks/data/political_sample.jsonl (one JSON object
+per line with "text" and "political"), reports the confident decisions made
+at the configured thresholds, and the thresholds that keep the sample free
+of wrong confident answers.
+
+    python benchmarks/calibrate_political.py [--sample other.jsonl] [--verbose]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SAMPLE = os.path.join(ROOT, 'benchmarks', 'data', 'political_sample.jsonl')
+
+
+def load_sample(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sample', default=DEFAULT_SAMPLE, help="labelled JSONL sample")
+    parser.add_argument('--verbose', action='store_true', help="print every text's score and verdict")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import political_classifier as pc
+
+    sample = load_sample(args.sample)
+    wrong = []
+    decided = 0
+    for item in sample:
+        score = pc.political_score(item['text'])
+        verdict = pc.classify(item['text'])
+        if verdict is not None:
+            decided += 1
+            if verdict != item['political']:
+                wrong.append((item, score, verdict))
+        if args.verbose:
+            print(f"{item['political']!s:5} {score:.3f} {verdict!s:5} {item['text'][:70]}")
+
+    # Corroborated political texts can be accepted down to the lowest score that no
+    # corroborated non-political text reaches; texts with non-political evidence
+    # can be rejected up to the lowest score of such a political text
+    corroborated = [item for item in sample if _corroborated(pc, item['text'])]
+    false_yes = [pc.political_score(i['text']) for i in corroborated if not i['political']]
+    political = [pc.political_score(i['text']) for i in sample
+                 if i['political'] and _non_political(pc, i['text'])]
+
+    report = {
+        'sample': len(sample),
+        'yes_threshold': pc.POLITICAL_YES_THRESHOLD,
+        'no_threshold': pc.POLITICAL_NO_THRESHOLD,
+        'decided': decided,
+        'bypass_rate': round(decided / len(sample), 4) if sample else 0.0,
+        'wrong': len(wrong),
+        'safe_yes_threshold_above': round(max(false_yes), 4) if false_yes else None,
+        'safe_no_threshold_below': round(min(political), 4) if political else None,
+    }
+    print(json.dumps(report, indent=2))
+    for item, score, verdict in wrong:
+        print(f"WRONG {verdict} (score {score:.3f}): {item['text'][:100]}", file=sys.stderr)
+    return 1 if wrong else 0
+
+
+def _corroborated(pc, text):
+    counts = pc.features(text)
+    return counts['entities'] >= 1 and counts['terms'] + counts['context'] >= 1
+
+
+def _non_political(pc, text):
+    counts = pc.features(text)
+    return (counts['non_political'] >= 1
+            and counts['entities'] + counts['agencies'] + counts['terms'] == 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Query-count regression check for the article read paths.
+
+Seeds a throwaway SQLite database with one user's articles (five breakdowns
+each), counts the SQL statements DatabaseManager issues for the history
+listing and the detail lookups, and exits non-zero when a path does not
+issue exactly its expected number, e.g. when breakdowns are loaded per
+article again. The per-user count cache is cleared before each check so
+the count query is always measured.
+
+    python benchmarks/check_query_counts.py --articles 1000
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# SQLAlchemy's selectinload sends the IN list in batches of this size
+SELECTIN_BATCH = 500
+
+
+class QueryCounter:
+    """Counts statements sent through an engine on this thread."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        statements = getattr(self._local, 'statements', None)
+        if statements is not None:
+            statements.append(statement)
+
+    @contextlib.contextmanager
+    def counting(self):
+        self._local.statements = statements = []
+        try:
+            yield statements
+        finally:
+            self._local.statements = None
+
+
+def load_database(workdir):
+    """Import the database module against a database file in `workdir`."""
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'truthguard.db')
+    sys.path.insert(0, ROOT)
+    import database
+    return database
+
+
+def seed(database, articles, breakdowns_per_article=5):
+    from models import Article, Breakdown, User
+
+    session = database.db_manager.get_session()
+    try:
+        user = User(username='querycount', email='querycount@truthguard.local')
+        user.set_password('querycount')
+        session.add(user)
+        session.flush()
+        started = datetime.utcnow()
+        for i in range(articles):
+            content = f'Query count article {i}.'
+            article = Article(
+                title=f'Article {i}', content=content, content_sha256=Article.hash_content(content),
+                summary='Summary.', input_type='snippet', analysis_date=started - timedelta(minutes=i),
+                factuality_score=50, factuality_level='Mixed', user_id=user.id
+            )
+            session.add(article)
+            session.flush()
+            session.add_all(
+                Breakdown(article_id=article.id, number=n, explanation=f'Point {n}')
+                for n in range(1, breakdowns_per_article + 1)
+            )
+        session.commit()
+        return user.id, article.id
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=1000, help="articles to seed (default: 1000)")
+    parser.add_argument('--page-size', type=int, default=1000,
+                        help="items_per_page of the history listing (default: 1000)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with contextlib.redirect_stdout(sys.stderr):
+            database = load_database(workdir)
+            user_id, article_id = seed(database, args.articles)
+        manager = database.db_manager
+        counter = QueryCounter(manager.engine)
+        page_rows = min(args.articles, args.page_size)
+        cursor = database.decode_cursor(manager.get_user_articles(user_id, items_per_page=1)['next_cursor'])
+
+        checks = [
+            # count + page + batched breakdowns
+            ('get_user_articles(include_breakdowns=True)', 2 + -(-page_rows // SELECTIN_BATCH),
+             lambda: manager.get_user_articles(user_id, items_per_page=args.page_size, include_breakdowns=True)),
+            ('get_user_articles()', 2,
+             lambda: manager.get_user_articles(user_id, items_per_page=args.page_size)),
+            # Cursor ownership check + page; no count and no OFFSET
+            ('get_user_articles(after_id=cursor)', 2,
+             lambda: manager.get_user_articles(user_id, items_per_page=10, after_id=cursor, include_total=False)),
+            ('get_full_article_data', 1, lambda: manager.get_full_article_data(article_id)),
+            ('get_user_article_by_id', 1, lambda: manager.get_user_article_by_id(user_id, article_id)),
+        ]
+
+        failed = False
+        for name, expected, call in checks:
+            manager._forget_article_count(user_id)
+            with counter.counting() as statements:
+                result = call()
+            ok = result is not None and len(statements) == expected
+            failed = failed or not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {name}: {len(statements)} queries (expected {expected})")
+        manager.engine.dispose()
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Local explicit-content pre-screen for the detector's safety gate.
+
+An Aho-Corasick automaton over an English/Filipino lexicon scans the text
+once, in time linear in its length. Terms come in two tiers:
+
+* explicit   - unambiguous sexual/pornographic vocabulary
+* borderline - words that are legitimate in news (violence, crime,
+               profanity in quotes) but may indicate harmful content
+
+Text with enough explicit hits is rejected outright; everything else is left
+to the LLM. No lexicon lists every explicit word, so an absence of hits is
+never taken as proof that a text is clean.
+"""
+
+import os
+import threading
+from collections import deque
+
+CONTENT_SCREEN_ENABLED = os.getenv('CONTENT_SCREEN_ENABLED', 'true').lower() == 'true'
+# Explicit-term hits needed to reject without asking the LLM
+SAFETY_EXPLICIT_THRESHOLD = int(os.getenv('SAFETY_EXPLICIT_THRESHOLD', '3'))
+
+# Only vocabulary with no ordinary news use; descriptive terms that also show
+# up in legitimate reporting (scandal coverage, trafficking raids, laws) are
+# borderline so the LLM decides
+EXPLICIT_TERMS = [
+    # English
+    'porno', 'hentai', 'hardcore sex', 'blowjob', 'handjob', 'dildo', 'camgirl',
+    # Filipino
+    'kantot', 'kantutan', 'kinantot', 'iyot', 'jakol', 'nagjakol', 'chupa', 'tite', 'pekpek',
+    'burat',
+]
+
+BORDERLINE_TERMS = [
+    # English
+    'sex', 'sexual', 'sexy', 'nude', 'naked', 'topless', 'rape', 'raped', 'rapist', 'molest',
+    'molested', 'gore', 'beheaded', 'beheading', 'decapitated', 'mutilated', 'dismembered',
+    'suicide', 'self-harm', 'kill yourself', 'fuck', 'fucking', 'shit', 'bitch', 'bastard',
+    'slut', 'whore', 'prostitute', 'prostitution', 'child abuse', 'puke',
+    'porn', 'pornography', 'pornographic', 'xxx', 'nsfw', 'nudes', 'sex video', 'sex videos',
+    'sex scandal', 'sex scandal video', 'scandal video', 'sex tape', 'cybersex', 'masturbate',
+    'masturbating', 'masturbation', 'orgasm', 'orgy', 'onlyfans leak', 'erotic',
+    'explicit photos', 'nude photos',
+    # Filipino
+    'putangina', 'putang ina', 'tangina', 'gago', 'gaga', 'ulol', 'tarantado', 'bobo',
+    'hubad', 'hubo', 'ginahasa', 'panggagahasa', 'gahasa', 'patayin', 'pinugutan',
+    'magpakamatay', 'bugaw', 'puta', 'bayag', 'libog', 'malibog', 'pokpok',
+    'hubad na larawan', 'hubad na video', 'bold video',
+]
+
+
+class Automaton:
+    """Aho-Corasick multi-pattern matcher with whole-word matching."""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for label, words in patterns.items():
+            for word in words:
+                self._insert(word.lower(), label)
+        self._build()
+
+    def _insert(self, word, label):
+        node = 0
+        for ch in word:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(word), label))
+
+    def _build(self):
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for ch, child in self._goto[node].items():
+                pending.append(child)
+                state = self._fail[node]
+                while state and ch not in self._goto[state]:
+                    state = self._fail[state]
+                fallback = self._goto[state].get(ch, 0)
+                self._fail[child] = fallback if fallback != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def scan(self, text):
+        """Counts whole-word, non-overlapping (longest first) matches per label."""
+        text = (text or '').lower()
+        matches = []
+        node = 0
+        last = len(text) - 1
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, label in self._out[node]:
+                start = i - length + 1
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if i < last and text[i + 1].isalnum():
+                    continue
+                matches.append((start, -length, label))
+
+        counts = {}
+        covered = -1
+        for start, neg_length, label in sorted(matches):
+            if start <= covered:
+                continue
+            covered = start - neg_length - 1
+            counts[label] = counts.get(label, 0) + 1
+        return counts
+
+_automaton = Automaton({'explicit': EXPLICIT_TERMS, 'borderline': BORDERLINE_TERMS})
+
+_stats_lock = threading.Lock()
+_stats = {'explicit': 0, 'flagged': 0, 'unflagged': 0}
+
+
+def screen(text):
+    """
+    Returns False when the text is clearly explicit, otherwise None: the text
+    must still be checked by the LLM.
+    """
+    counts = _automaton.scan(text)
+    explicit = counts.get('explicit', 0)
+
+    if explicit >= SAFETY_EXPLICIT_THRESHOLD:
+        verdict, key = False, 'explicit'
+    elif counts:
+        verdict, key = None, 'flagged'
+    else:
+        verdict, key = None, 'unflagged'
+    with _stats_lock:
+        _stats[key] += 1
+    return verdict
+
+
+def stats():
+    """Lexicon hit/miss counters and the share of checks that skipped the LLM."""
+    with _stats_lock:
+        counts = dict(_stats)
+    total = sum(counts.values())
+    counts.update({
+        'total': total,
+        'hits': counts['explicit'] + counts['flagged'],
+        'misses': counts['unflagged'],
+        'bypassed': counts['explicit'],
+        'bypass_rate': round(counts['explicit'] / total, 4) if total else 0.0,
+    })
+    return counts
@@ -1,32 +1,101 @@
+import base64
+import json
 import os
-from sqlalchemy import create_engine, or_
-from sqlalchemy.orm import declarative_base, scoped_session
+import threading
+import time
+from sqlalchemy import create_engine, event, or_, select, tuple_
+from sqlalchemy.orm import defer, joinedload, scoped_session, selectinload
 from sqlalchemy.orm.session import sessionmaker
 from dotenv import load_dotenv
-from models import Article, Breakdown, Feedback, User
+from models import Base, Article, Breakdown, Feedback, User
 from datetime import datetime
 
 load_dotenv()
 
-# Create a configured "Session" class
-Base = declarative_base()
+# SQLite engine profile: WAL lets history reads proceed while the detector
+# writes, and busy_timeout makes writers wait for the lock instead of failing
+# with "database is locked"
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000'))
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+
+# How long a user's article count may be served from memory (inserts through
+# this process invalidate it immediately)
+ARTICLE_COUNT_TTL_SECONDS = float(os.getenv('ARTICLE_COUNT_TTL_SECONDS', '60'))
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Apply the SQLite engine profile to a new DBAPI connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(db_uri):
+    """Create an engine for `db_uri`, with the SQLite profile and pool settings for SQLite files."""
+    if not db_uri.startswith('sqlite'):
+        return create_engine(db_uri, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                             pool_timeout=DB_POOL_TIMEOUT, pool_pre_ping=True)
+    if db_uri in ('sqlite://', 'sqlite:///:memory:'):
+        # In-memory databases live in a single connection; pool settings don't apply
+        engine = create_engine(db_uri)
+    else:
+        engine = create_engine(
+            db_uri,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            connect_args={'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000, 'check_same_thread': False}
+        )
+    event.listen(engine, 'connect', apply_sqlite_pragmas)
+    return engine
+
+
+def encode_cursor(article_id):
+    """Opaque pagination cursor pointing just past the given article."""
+    payload = json.dumps({'i': article_id})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the article id a cursor points past; raises ValueError if it is malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return int(payload['i'])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
 
 class DatabaseManager:
     def __init__(self, db_uri=None):
         """Initialize database connection using SQLAlchemy."""
         if db_uri is None:
             # Default to SQLite if no URI provided
-            db_path = os.path.join(os.path.dirname(__file__), 'instance', 'truthguard.db')
+            db_path = os.getenv('DATABASE_PATH') or os.path.join(os.path.dirname(__file__), 'instance', 'truthguard.db')
             os.makedirs(os.path.dirname(db_path), exist_ok=True)
             db_uri = f'sqlite:///{db_path}'
         
-        self.engine = create_engine(db_uri)
+        self.engine = create_db_engine(db_uri)
         self.Session = scoped_session(sessionmaker(bind=self.engine))
+        self._article_counts = {}  # user_id -> (count, cached_at)
+        self._article_counts_lock = threading.Lock()
         
         # Import all models to ensure they're registered
-        from models import Article, Breakdown, Feedback, User, GameLevel, UserGameProgress, GameSession
+        from models import Article, Breakdown, Feedback, User, GameLevel, UserGameProgress, GameSession, AnalysisCacheEntry
         
-        # Create tables if they don't exist
+        # Create tables if they don't exist (existing tables are left untouched)
         Base.metadata.create_all(self.engine)
         
         # Check if migration is needed
@@ -38,14 +107,14 @@ class DatabaseManager:
             from sqlalchemy import inspect
             inspector = inspect(self.engine)
             
-            # Check if articles table has user_id column
+            # Check if articles table has the user_id and content_sha256 columns
             if 'articles' in inspector.get_table_names():
                 articles_columns = [col['name'] for col in inspector.get_columns('articles')]
-                if 'user_id' not in articles_columns:
+                if 'user_id' not in articles_columns or 'content_sha256' not in articles_columns:
                     print("\n⚠️  WARNING: Database migration needed!")
                     print("Your database schema is outdated and needs to be migrated.")
                     print("Please run: python migrate_database.py")
-                    print("This will add user association to articles without losing data.\n")
+                    print("This will add user association and content hashes to articles without losing data.\n")
                     
         except Exception as e:
             # If we can't check, just continue - the app will work with the current schema
@@ -59,6 +128,16 @@ class DatabaseManager:
         """Close the database connection."""
         self.Session.remove()
 
+    @staticmethod
+    def find_duplicate_article(session, user_id, title, content):
+        """The user's stored copy of this article (matched by content hash), or None."""
+        content_sha256 = Article.hash_content(content)
+        query = session.query(Article).filter(Article.user_id == user_id)
+        if content_sha256 is None:
+            # Articles without content can only be told apart by title
+            return query.filter(Article.content_sha256.is_(None), Article.title == title).first()
+        return query.filter(Article.content_sha256 == content_sha256).first()
+
     def insert_article(self, article_data):
         """Insert a new article and its breakdowns into the database with user association."""
         from sqlalchemy.exc import IntegrityError
@@ -75,11 +154,9 @@ class DatabaseManager:
                 return None
 
             # Check if article already exists for this user to avoid duplicate key error
-            existing = session.query(Article).filter(
-                Article.title == article_data.get('title'),
-                Article.content == article_data.get('content'),
-                Article.user_id == user_id
-            ).first()
+            existing = self.find_duplicate_article(
+                session, user_id, article_data.get('title'), article_data.get('content')
+            )
             
             if existing:
                 print(f"Article already exists with ID: {existing.id}")
@@ -90,6 +167,7 @@ class DatabaseManager:
                 title=article_data.get('title'),
                 link=article_data.get('link'),
                 content=article_data.get('content'),
+                content_sha256=Article.hash_content(article_data.get('content')),
                 summary=article_data.get('summary'),
                 input_type=article_data.get('input_type'),
                 factuality_score=article_data.get('factuality_score'),
@@ -117,17 +195,16 @@ class DatabaseManager:
                     session.add(breakdown)
             
             session.commit()
+            self._forget_article_count(user_id)
             return article.id
         except IntegrityError as e:
             session.rollback()
             # If we get an integrity error (unique constraint violation), 
             # try to find and return the existing article for this user
             try:
-                existing = session.query(Article).filter(
-                    Article.title == article_data.get('title'),
-                    Article.content == article_data.get('content'),
-                    Article.user_id == user_id
-                ).first()
+                existing = self.find_duplicate_article(
+                    session, user_id, article_data.get('title'), article_data.get('content')
+                )
                 if existing:
                     print(f"Duplicate detected, returning existing article ID: {existing.id}")
                     return existing.id
@@ -154,7 +231,10 @@ class DatabaseManager:
         """Get article data including breakdowns."""
         session = self.get_session()
         try:
-            article = session.query(Article).filter_by(id=article_id).first()
+            article = (session.query(Article)
+                       .options(joinedload(Article.breakdowns))
+                       .filter_by(id=article_id)
+                       .first())
             if not article:
                 return None
                 
@@ -170,16 +250,9 @@ class DatabaseManager:
                 'factuality_score': article.factuality_score,
                 'factuality_level': article.factuality_level,
                 'factuality_description': article.factuality_description,
-                'factuality_breakdown': []
+                'factuality_breakdown': [b.explanation for b in article.breakdowns]
             }
             
-            # Get breakdowns if any
-            breakdowns = (session.query(Breakdown)
-                         .filter_by(article_id=article.id)
-                         .order_by(Breakdown.number)
-                         .all())
-            article_dict['factuality_breakdown'] = [b.explanation for b in breakdowns]
-            
             return article_dict
         finally:
             session.close()
@@ -209,29 +282,73 @@ class DatabaseManager:
         finally:
             session.close()
 
-    def get_user_articles(self, user_id, page=1, items_per_page=50, include_breakdowns=False):
-        """Get articles for a specific user with pagination."""
+    def count_user_articles(self, user_id, session=None):
+        """Number of articles the user has, cached for ARTICLE_COUNT_TTL_SECONDS."""
+        with self._article_counts_lock:
+            cached = self._article_counts.get(user_id)
+        if cached and time.monotonic() - cached[1] < ARTICLE_COUNT_TTL_SECONDS:
+            return cached[0]
+        own_session = session is None
+        session = session or self.get_session()
+        try:
+            total = session.query(Article).filter(Article.user_id == user_id).count()
+        finally:
+            if own_session:
+                session.close()
+        with self._article_counts_lock:
+            self._article_counts[user_id] = (total, time.monotonic())
+        return total
+
+    def _forget_article_count(self, user_id):
+        with self._article_counts_lock:
+            self._article_counts.pop(user_id, None)
+
+    def get_user_articles(self, user_id, page=1, items_per_page=50, include_breakdowns=False,
+                          after_id=None, include_total=True):
+        """
+        Get articles for a specific user, most recent first.
+
+        Pages are addressed either by `page` (OFFSET) or, cheaper for long
+        histories, by `after_id`: the article id decoded from the previous
+        page's next_cursor. The total is only counted when `include_total` is
+        set, and is cached per user; the cached value only feeds `total`, the
+        rows are always queried, since other processes (job workers, the batch
+        CLI, other app workers) insert without clearing this process's cache.
+        Raises ValueError when `after_id` is not one of the user's articles.
+        """
         session = self.get_session()
         try:
-            # Calculate offset
-            offset = (page - 1) * items_per_page
+            total = self.count_user_articles(user_id, session) if include_total else None
             
-            # Base query for user's articles
-            base_query = session.query(Article).filter(Article.user_id == user_id)
-            
-            # Get total count
-            total = base_query.count()
-            
-            if total == 0:
-                return {
-                    'articles': [],
-                    'total': 0,
-                    'total_pages': 0
-                }
-            
-            # Get paginated articles ordered by most recent first
-            articles_query = base_query.order_by(Article.analysis_date.desc())
-            articles = articles_query.offset(offset).limit(items_per_page).all()
+            # Most recent first; id breaks ties so the order (and the cursor) is stable
+            articles_query = (session.query(Article)
+                              .options(defer(Article.content))
+                              .filter(Article.user_id == user_id)
+                              .order_by(Article.analysis_date.desc(), Article.id.desc()))
+            if include_breakdowns:
+                # One batched IN query for the whole page instead of one per article
+                articles_query = articles_query.options(selectinload(Article.breakdowns))
+            if after_id is not None:
+                cursor_row = (session.query(Article.id)
+                              .filter(Article.id == after_id, Article.user_id == user_id)
+                              .first())
+                if cursor_row is None:
+                    raise ValueError(f"Unknown cursor article {after_id}")
+                # Keyset on (analysis_date, id), compared with the row's stored values
+                # (older rows use a different datetime text format than new binds)
+                position = (select(Article.analysis_date, Article.id)
+                            .where(Article.id == after_id, Article.user_id == user_id)
+                            .scalar_subquery())
+                articles_query = articles_query.filter(tuple_(Article.analysis_date, Article.id) < position)
+            else:
+                articles_query = articles_query.offset((page - 1) * items_per_page)
+            # One extra row tells whether there is a next page
+            articles = articles_query.limit(items_per_page + 1).all()
+            has_more = len(articles) > items_per_page
+            articles = articles[:items_per_page]
+            if total is not None and after_id is None:
+                # A stale cached count may be behind the rows actually seen
+                total = max(total, (page - 1) * items_per_page + len(articles) + int(has_more))
             
             # Format articles
             formatted_articles = []
@@ -249,26 +366,25 @@ class DatabaseManager:
                 
                 # Include breakdown if requested
                 if include_breakdowns:
-                    # Get breakdown data
-                    breakdown_query = session.query(Breakdown).filter(
-                        Breakdown.article_id == article.id
-                    ).order_by(Breakdown.number).all()
-                    
                     article_data['factuality_breakdown'] = [
-                        breakdown.explanation for breakdown in breakdown_query
+                        breakdown.explanation for breakdown in article.breakdowns
                     ]
                 
                 formatted_articles.append(article_data)
             
             # Calculate total pages
-            total_pages = (total + items_per_page - 1) // items_per_page
+            total_pages = (total + items_per_page - 1) // items_per_page if total is not None else None
+            next_cursor = encode_cursor(articles[-1].id) if has_more else None
             
             return {
                 'articles': formatted_articles,
                 'total': total,
-                'total_pages': total_pages
+                'total_pages': total_pages,
+                'next_cursor': next_cursor
             }
             
+        except ValueError:
+            raise
         except Exception as e:
             print(f"Error getting user articles: {e}")
             return None
@@ -280,7 +396,7 @@ class DatabaseManager:
         session = self.get_session()
         try:
             # Query for article with user verification
-            article = session.query(Article).filter(
+            article = session.query(Article).options(joinedload(Article.breakdowns)).filter(
                 Article.id == article_id,
                 Article.user_id == user_id
             ).first()
@@ -288,11 +404,6 @@ class DatabaseManager:
             if not article:
                 return None
             
-            # Get breakdown data
-            breakdown_query = session.query(Breakdown).filter(
-                Breakdown.article_id == article.id
-            ).order_by(Breakdown.number).all()
-            
             # Format article data
             article_data = {
                 'id': article.id,
@@ -302,7 +413,7 @@ class DatabaseManager:
                 'factuality_score': article.factuality_score,
                 'factuality_level': article.factuality_level,
                 'factuality_description': article.factuality_description,
-                'factuality_breakdown': [breakdown.explanation for breakdown in breakdown_query],
+                'factuality_breakdown': [breakdown.explanation for breakdown in article.breakdowns],
                 'analysis_date': article.analysis_date,
                 'input_type': article.input_type,
                 'link': article.link,
@@ -0,0 +1,283 @@
+"""
+Near-duplicate article detection with MinHash and locality-sensitive hashing.
+
+Each article is reduced to a MinHash signature over its word shingles; the
+signature is split into bands and every band is hashed into a bucket, so
+candidates for a new text are found with a handful of dictionary lookups no
+matter how many articles are indexed. Candidates are then ranked by their
+estimated Jaccard similarity (the fraction of matching signature slots).
+
+Computing a signature costs tens of milliseconds per thousand words, so
+signatures are kept in a small SQLite store next to the main database, keyed
+by article id and checked against the article's content_sha256. A rebuild
+only computes signatures for articles that are new or changed since the last
+one, in any process.
+"""
+
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import closing
+
+from text_utils import content_digest, normalize_text
+
+NEAR_DUPLICATE_ENABLED = os.getenv('NEAR_DUPLICATE_ENABLED', 'true').lower() == 'true'
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.9'))
+NEAR_DUPLICATE_PERSIST = os.getenv('NEAR_DUPLICATE_PERSIST', 'true').lower() == 'true'
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text, k=3):
+    """Set of hashed k-word shingles of the normalized text."""
+    words = _WORD_RE.findall(normalize_text(text))
+    if len(words) < k:
+        words_k = [' '.join(words)] if words else []
+    else:
+        words_k = (' '.join(words[i:i + k]) for i in range(len(words) - k + 1))
+    return {
+        int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little')
+        for s in words_k
+    }
+
+
+def get_signature_store_path():
+    """Get the path to the SQLite signature store (NEAR_DUPLICATE_STORE_PATH overrides it)."""
+    if os.getenv('NEAR_DUPLICATE_STORE_PATH'):
+        return os.getenv('NEAR_DUPLICATE_STORE_PATH')
+    db_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+    os.makedirs(db_dir, exist_ok=True)
+    return os.path.join(db_dir, 'dedup_signatures.db')
+
+
+class SignatureStore:
+    """
+    SQLite store of MinHash signatures. `params` identifies the hash family
+    (permutation count and seed); rows made with other parameters, or for
+    other content, are ignored. The database is created on first use.
+    """
+
+    def __init__(self, params, db_path=None):
+        self.params = params
+        self._db_path = db_path
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def db_path(self):
+        if self._db_path is None:
+            self._db_path = get_signature_store_path()
+        return self._db_path
+
+    def _ensure_schema(self):
+        with closing(sqlite3.connect(self.db_path, timeout=30, isolation_level=None)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS signatures (
+                    article_id INTEGER PRIMARY KEY,
+                    content_sha256 TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    signature BLOB NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        if not self._schema_ready:
+            with self._lock:
+                if not self._schema_ready:
+                    self._ensure_schema()
+                    self._schema_ready = True
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def load(self, digests):
+        """Stored signatures for {article_id: content_sha256}, as {article_id: signature}."""
+        if not digests:
+            return {}
+        ids = list(digests)
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    f"SELECT article_id, content_sha256, signature FROM signatures "
+                    f"WHERE params = ? AND article_id IN ({','.join('?' * len(ids))})",
+                    [self.params] + ids
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading near-duplicate signatures: {e}")
+            return {}
+        return {
+            article_id: struct.unpack(f'<{len(blob) // 4}I', blob)
+            for article_id, digest, blob in rows
+            if digests[article_id] == digest
+        }
+
+    def save(self, rows):
+        """Store (article_id, content_sha256, signature) rows."""
+        rows = [
+            (article_id, digest, self.params, struct.pack(f'<{len(sig)}I', *sig))
+            for article_id, digest, sig in rows if digest
+        ]
+        if not rows:
+            return
+        try:
+            with closing(self._connect()) as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO signatures (article_id, content_sha256, params, signature) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows
+                )
+        except sqlite3.Error as e:
+            print(f"Error writing near-duplicate signatures: {e}")
+
+
+class NearDuplicateIndex:
+    """Thread-safe in-memory MinHash/LSH index of article content."""
+
+    def __init__(self, num_perm=128, bands=16, threshold=NEAR_DUPLICATE_THRESHOLD, seed=1,
+                 persist=NEAR_DUPLICATE_PERSIST, store_path=None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self._buckets = [dict() for _ in range(bands)]
+        self._signatures = {}
+        self._owners = {}
+        self._lock = threading.RLock()
+        self.ready = False
+        self.store = SignatureStore(f'minhash-{num_perm}-{seed}', store_path) if persist else None
+
+    def signature(self, text):
+        """MinHash signature of the text, or None if it has no words."""
+        hashes = shingles(text)
+        if not hashes:
+            return None
+        p = _MERSENNE_PRIME
+        return tuple(
+            min(((a * h + b) % p) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        )
+
+    def _band_keys(self, sig):
+        r = self.rows
+        return [hash(sig[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    def add(self, article_id, text, user_id=None, signature=None):
+        """Index (or re-index) an article, saving its signature when `text` is given."""
+        sig = signature or self.signature(text)
+        if sig is None:
+            return
+        if self.store and text:
+            self.store.save([(article_id, content_digest(text), sig)])
+        with self._lock:
+            self.remove(article_id)
+            self._signatures[article_id] = sig
+            self._owners[article_id] = user_id
+            for band, key in zip(self._buckets, self._band_keys(sig)):
+                band.setdefault(key, set()).add(article_id)
+
+    def remove(self, article_id):
+        """Drop an article from the index."""
+        with self._lock:
+            sig = self._signatures.pop(article_id, None)
+            self._owners.pop(article_id, None)
+            if sig is None:
+                return
+            for band, key in zip(self._buckets, self._band_keys(sig)):
+                ids = band.get(key)
+                if ids:
+                    ids.discard(article_id)
+                    if not ids:
+                        del band[key]
+
+    def query(self, text=None, signature=None, threshold=None):
+        """
+        Returns a list of (article_id, user_id, similarity) with estimated
+        similarity at or above the threshold, best match first.
+        """
+        sig = signature or self.signature(text)
+        if sig is None:
+            return []
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            candidates = set()
+            for band, key in zip(self._buckets, self._band_keys(sig)):
+                candidates.update(band.get(key, ()))
+            matches = []
+            for article_id in candidates:
+                other = self._signatures[article_id]
+                similarity = sum(1 for x, y in zip(sig, other) if x == y) / self.num_perm
+                if similarity >= threshold:
+                    matches.append((article_id, self._owners.get(article_id), similarity))
+        matches.sort(key=lambda m: m[2], reverse=True)
+        return matches
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def rebuild(self, db_manager, batch_size=500):
+        """
+        Re-index every stored article from the database. Stored signatures are
+        reused; only new or changed articles have their content loaded and
+        their signature computed.
+        """
+        from models import Article
+
+        started = time.perf_counter()
+        session = db_manager.get_session()
+        try:
+            last_id, count, computed = 0, 0, 0
+            while True:
+                rows = (session.query(Article.id, Article.user_id, Article.content_sha256)
+                        .filter(Article.id > last_id)
+                        .order_by(Article.id)
+                        .limit(batch_size)
+                        .all())
+                if not rows:
+                    break
+                stored = self.store.load({a: d for a, _, d in rows if d}) if self.store else {}
+                missing = [article_id for article_id, _, _ in rows if article_id not in stored]
+                contents = dict(
+                    session.query(Article.id, Article.content).filter(Article.id.in_(missing)).all()
+                ) if missing else {}
+                fresh = []
+                for article_id, user_id, digest in rows:
+                    sig = stored.get(article_id)
+                    if sig is None:
+                        content = contents.get(article_id) or ''
+                        sig = self.signature(content)
+                        if sig is None:
+                            continue
+                        fresh.append((article_id, digest or content_digest(content), sig))
+                        computed += 1
+                    self.add(article_id, None, user_id, signature=sig)
+                    count += 1
+                if self.store:
+                    self.store.save(fresh)
+                last_id = rows[-1][0]
+            self.ready = True
+            print(f"Near-duplicate index built: {count} articles ({computed} signatures computed) "
+                  f"in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            print(f"Error building near-duplicate index: {e}")
+        finally:
+            session.close()
+
+    def rebuild_in_background(self, db_manager):
+        """Start rebuild() on a daemon thread; lookups work on what is indexed so far."""
+        t = threading.Thread(target=self.rebuild, args=(db_manager,), name='dedup-index-rebuild', daemon=True)
+        t.start()
+        return t
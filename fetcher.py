@@ -0,0 +1,217 @@
+"""
+Article fetch layer for TruthGuard.
+
+fetch_article() downloads and parses a URL once and returns everything the
+pipeline needs (text, title and metadata). Raw pages are kept in an on-disk
+cache: fresh entries (younger than the TTL) are served without any network
+traffic, and stale ones are revalidated with If-None-Match/If-Modified-Since
+so an unchanged page costs a 304 instead of a full download.
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from newspaper import Article, Config
+from newspaper.network import multithread_request
+
+import recordings
+
+FETCH_CACHE_TTL_SECONDS = int(os.getenv('FETCH_CACHE_TTL_SECONDS', '3600'))
+FETCH_CACHE_MAX_AGE_DAYS = int(os.getenv('FETCH_CACHE_MAX_AGE_DAYS', '7'))
+FETCH_TIMEOUT_SECONDS = int(os.getenv('FETCH_TIMEOUT_SECONDS', '15'))
+
+FetchedArticle = namedtuple('FetchedArticle', [
+    'url', 'title', 'text', 'authors', 'publish_date', 'top_image',
+    'meta_description', 'canonical_link', 'from_cache'
+])
+
+_newspaper_config = Config()
+_stores_since_prune = 0
+
+
+def get_fetch_cache_dir():
+    """Get the directory holding cached pages."""
+    cache_dir = os.getenv('FETCH_CACHE_DIR') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'instance', 'fetch_cache'
+    )
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def _cache_path(url):
+    return os.path.join(get_fetch_cache_dir(), hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+
+def _load_cached(url):
+    try:
+        with open(_cache_path(url), encoding='utf-8') as f:
+            entry = json.load(f)
+        return entry if entry.get('url') == url else None
+    except (OSError, ValueError):
+        return None
+
+
+def store_page(url, html, etag=None, last_modified=None):
+    """Write a downloaded page to the cache (atomically)."""
+    global _stores_since_prune
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    entry = {
+        'url': url,
+        'html': html,
+        'etag': etag,
+        'last_modified': last_modified,
+        'fetched_at': time.time()
+    }
+    path = _cache_path(url)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error writing fetch cache: {e}")
+
+    _stores_since_prune += 1
+    if _stores_since_prune >= 100:
+        _stores_since_prune = 0
+        prune_cache()
+    return entry
+
+
+def prune_cache(max_age_days=FETCH_CACHE_MAX_AGE_DAYS):
+    """Remove cached pages that have not been fetched or revalidated recently."""
+    cutoff = time.time() - max_age_days * 86400
+    cache_dir = get_fetch_cache_dir()
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _html_from_response(resp):
+    # Same decoding rules as newspaper's own downloader
+    if resp.encoding != 'ISO-8859-1':
+        return resp.text
+    html = resp.content
+    if 'charset' not in resp.headers.get('content-type', ''):
+        encodings = requests.utils.get_encodings_from_content(resp.text)
+        if encodings:
+            resp.encoding = encodings[0]
+            html = resp.text
+    return html
+
+
+def fetch_page(url):
+    """
+    Returns (html, from_cache) for a URL, using the disk cache.
+
+    Raises requests.RequestException if the page cannot be downloaded.
+    In replay mode pages come only from recordings.
+    """
+    if recordings.BACKEND_MODE == 'replay':
+        try:
+            return recordings.replay('fetch', recordings.recording_key('fetch', url))['html'], False
+        except recordings.RecordingNotFound as e:
+            raise requests.RequestException(str(e))
+
+    start = time.perf_counter()
+    html, from_cache = _fetch_page(url)
+    if recordings.BACKEND_MODE == 'record':
+        recordings.save('fetch', recordings.recording_key('fetch', url),
+                        {'url': url, 'html': html}, time.perf_counter() - start)
+    return html, from_cache
+
+
+def _fetch_page(url):
+    entry = _load_cached(url)
+    # Recordings must capture real download latencies, not cache hits
+    fresh = entry and time.time() - entry['fetched_at'] < FETCH_CACHE_TTL_SECONDS
+    if fresh and recordings.BACKEND_MODE != 'record':
+        return entry['html'], True
+
+    headers = {'User-Agent': _newspaper_config.browser_user_agent}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    resp = requests.get(url, headers=headers, timeout=FETCH_TIMEOUT_SECONDS, allow_redirects=True)
+    if resp.status_code == 304 and entry:
+        entry = store_page(url, entry['html'], entry.get('etag'), entry.get('last_modified'))
+        return entry['html'], True
+
+    resp.raise_for_status()
+    html = _html_from_response(resp)
+    entry = store_page(url, html, resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+    return entry['html'], False
+
+
+def is_fresh(url):
+    """True if the page is cached and younger than the TTL."""
+    entry = _load_cached(url)
+    return bool(entry) and time.time() - entry['fetched_at'] < FETCH_CACHE_TTL_SECONDS
+
+
+def prefetch_pages(urls, threads=10):
+    """
+    Download many pages at once with newspaper's multi-threaded downloader
+    and seed the cache, so later fetch_article() calls are served locally.
+    Returns the number of pages stored; failures are left for fetch_article().
+    """
+    if recordings.BACKEND_MODE == 'replay':
+        return 0
+    pending = [url for url in dict.fromkeys(urls) if url and not is_fresh(url)]
+    if not pending:
+        return 0
+
+    config = Config()
+    config.number_threads = threads
+    config.request_timeout = FETCH_TIMEOUT_SECONDS
+    stored = 0
+    for req in multithread_request(pending, config):
+        if req.resp is not None and req.resp.status_code == 200:
+            store_page(req.url, _html_from_response(req.resp),
+                       req.resp.headers.get('ETag'), req.resp.headers.get('Last-Modified'))
+            stored += 1
+    return stored
+
+
+def parse_article(url, html, from_cache=False):
+    """Parse downloaded HTML into a FetchedArticle."""
+    art = Article(url)
+    art.download(input_html=html)
+    art.parse()
+    return FetchedArticle(
+        url=url,
+        title=(art.title or '').strip() or None,
+        text=art.text,
+        authors=list(art.authors or []),
+        publish_date=art.publish_date.isoformat() if art.publish_date else None,
+        top_image=art.top_image or None,
+        meta_description=art.meta_description or None,
+        canonical_link=art.canonical_link or None,
+        from_cache=from_cache
+    )
+
+
+def normalize_url(url):
+    """Canonical form of a URL for keying: lowercase scheme/host, no fragment or trailing slash."""
+    parts = urlsplit((url or '').strip())
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+
+def fetch_article(url):
+    """Download (or reuse) and parse the article at `url`."""
+    html, from_cache = fetch_page(url)
+    return parse_article(url, html, from_cache)
@@ -1,7 +1,9 @@
 import os
 import json
 import random
-import google.generativeai as genai
+import llm
+import model_routing
+import recordings
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,9 +12,9 @@ class GameContentGenerator:
     def __init__(self):
         """Initialize the game content generator with AI model."""
         api_key = os.getenv('GAME_API_KEY') or os.getenv('API_KEY')
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel("gemini-2.0-flash")
+        if api_key or recordings.BACKEND_MODE == 'replay':
+            llm.configure(api_key, name='game')
+            self.model = model_routing.models_for('game')[0]
         else:
             print("Warning: No API key found. Using fallback content generation.")
             self.model = None
@@ -98,8 +100,7 @@ class GameContentGenerator:
             - Expert analysis of authenticity markers
             """
             
-            response = self.model.generate_content(prompt)
-            content_text = response.text.strip()
+            content_text = llm.generate(prompt, stage='game', api_key_name='game', cache=False).strip()
             
             # Clean up the response to ensure it's valid JSON
             if content_text.startswith('```json'):
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from models import Base
 from datetime import datetime
@@ -43,6 +43,10 @@ class UserGameProgress(Base):
     user_answer = Column(Boolean)  # True for real, False for fake
     evidence_gathered = Column(JSON)  # Track which evidence user viewed
     
+    __table_args__ = (
+        Index('ix_user_game_progress_user_id_level_id', 'user_id', 'level_id'),
+    )
+    
     # Relationships
     level = relationship("GameLevel", back_populates="user_progress")
     
@@ -60,5 +64,9 @@ class GameSession(Base):
     start_time = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
     
+    __table_args__ = (
+        Index('ix_game_sessions_user_id_is_active', 'user_id', 'is_active'),
+    )
+    
     def __repr__(self):
         return f"<GameSession(user_id={self.user_id}, level_id={self.level_id})>"
@@ -1,34 +1,64 @@
 """Helper functions and routes for the TruthGuard application."""
 
-import google.generativeai as genai
-from newspaper import Article
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from flask import Blueprint, request, jsonify, current_app
 from urllib.parse import urlparse
 from datetime import datetime
 from sqlalchemy import or_
 
-from database import get_db_session
+import content_screen
+import llm
+from llm import LLMUnavailableError
+import political_classifier
+from database import DatabaseManager, get_db_session
+from fetcher import fetch_article
+from metrics import stage_metrics
 from models import Article as ArticleModel, Breakdown as BreakdownModel
 
 helpers_bp = Blueprint('helpers_bp', __name__)
 
+# Gate checks (title, political, safety) are independent Gemini calls, so by
+# default they run side by side on a bounded pool shared by all requests. The
+# pool holds all three checks of DETECTOR_CONCURRENCY simultaneous requests, so
+# requests only queue behind each other beyond that.
+CONCURRENT_GATE_CHECKS = os.getenv('CONCURRENT_GATE_CHECKS', 'true').lower() == 'true'
+DETECTOR_CONCURRENCY = int(os.getenv('DETECTOR_CONCURRENCY', '32'))
+GATE_CHECK_WORKERS = int(os.getenv('GATE_CHECK_WORKERS', str(DETECTOR_CONCURRENCY * 3)))
+_gate_executor = ThreadPoolExecutor(max_workers=GATE_CHECK_WORKERS, thread_name_prefix='gate-check')
+
+# Analysis overlapped with the request thread (factuality while the summary is
+# generated) gets its own pool, one task per concurrent request, so it never
+# waits behind other requests' gate checks.
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', str(DETECTOR_CONCURRENCY)))
+_analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='analysis')
+
 def is_political_article(text):
     """
     Returns True if the text is about Philippine political news, False otherwise.
+    Obvious cases are decided by the local classifier; only uncertain text
+    reaches Gemini.
     """
+    if political_classifier.POLITICAL_CLASSIFIER_ENABLED:
+        verdict = political_classifier.classify(text)
+        if verdict is not None:
+            return verdict
     try:
         prompt = (
             "Analyze the following text and determine if it is about current political news in the Philippines. "
             "Respond with 'Yes' if it is Philippine political news, or 'No' otherwise.\n\n"
             f"Text:\n{text}\n\nIs this about Philippine political news?"
         )
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        reply = model.generate_content(prompt).text.strip().lower()
+        reply = llm.generate(prompt, stage='political').strip().lower()
         if 'yes' in reply:
             return True
         if 'no' in reply:
             return False
         return False
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         print(f"Error in is_political_article: {e}")
         return False
@@ -36,20 +66,27 @@ def is_political_article(text):
 def is_content_safe(text):
     """
     Returns True if the text is safe (no explicit/harmful content), False otherwise.
+    Clearly explicit text is rejected by the local pre-screen; everything else
+    is checked by Gemini.
     """
+    if content_screen.CONTENT_SCREEN_ENABLED:
+        verdict = content_screen.screen(text)
+        if verdict is not None:
+            return verdict
     try:
         prompt = (
             "Analyze the following text for explicit or harmful content. "
             "Respond with 'Safe' if appropriate, or 'Unsafe' if it contains disallowed content.\n\n"
             f"Text:\n{text}\n\nIs this content safe?"
         )
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        reply = model.generate_content(prompt).text.strip().lower()
-        if 'safe' in reply:
-            return True
+        reply = llm.generate(prompt, stage='safety').strip().lower()
         if 'unsafe' in reply:
             return False
+        if 'safe' in reply:
+            return True
         return False
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         print(f"Error in is_content_safe: {e}")
         return False
@@ -60,19 +97,17 @@ def generate_article_title(content, input_type, url=None):
     """
     try:
         if input_type == 'link' and url:
-            art = Article(url)
-            art.download()
-            art.parse()
+            # Served from the fetch cache when the pipeline already downloaded it
+            art = fetch_article(url)
             if art.title:
-                return art.title.strip()
+                return art.title
 
         prompt = (
             "Please provide a single concise and descriptive title for the following article content. "
             "Respond with only the title, no additional text or formatting:\n\n"
             f"{content}\n\nTitle:"
         )
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        response = model.generate_content(prompt).text.strip()
+        response = llm.generate(prompt, stage='title').strip()
         
         # Extract only the first line or the first sentence to ensure single title
         title = response.split('\n')[0].strip()
@@ -80,15 +115,82 @@ def generate_article_title(content, input_type, url=None):
         title = title.strip('"').strip("'").strip()
         
         return title
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         print(f"Error in generate_article_title: {e}")
         return 'No Title'
 
-def get_existing_article(db_manager, title, content, source_url=None):
-    """Check if an article already exists for the current user."""
+def submit_analysis_task(stage, fn, *args):
+    """
+    Run fn(*args) on the analysis pool and return its Future. The time spent
+    queued is recorded under `<stage>_queue` and the run time under `stage`.
+    """
+    submitted = time.perf_counter()
+
+    def run():
+        stage_metrics.record(f'{stage}_queue', time.perf_counter() - submitted)
+        return stage_metrics.measured(stage, fn, *args)
+
+    return _analysis_executor.submit(run)
+
+class GateChecks:
+    """
+    Runs the title, political and safety checks for one submission.
+
+    In concurrent mode all checks are submitted to the shared pool at once and
+    result() waits for the requested one. In sequential mode each check runs
+    lazily on its first result() call, matching the original one-by-one flow.
+    Exceptions raised by a check are re-raised from result().
+    """
+
+    def __init__(self, content, input_type, url=None, with_title=True, concurrent=None):
+        self._calls = {
+            'political': (is_political_article, (content,)),
+            'safety': (is_content_safe, (content,)),
+        }
+        if with_title:
+            self._calls['title'] = (generate_article_title, (content, input_type, url))
+
+        self.concurrent = CONCURRENT_GATE_CHECKS if concurrent is None else concurrent
+        self.timings = {}
+        self._futures = {}
+        self._started = time.perf_counter()
+
+        if self.concurrent:
+            for name in self._calls:
+                self._futures[name] = _gate_executor.submit(self._run, name)
+
+    def _run(self, name):
+        fn, args = self._calls[name]
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.timings[name] = time.perf_counter() - start
+            stage_metrics.record(name, self.timings[name])
+
+    def result(self, name):
+        """Return the result of a check, waiting for it if necessary."""
+        future = self._futures.get(name)
+        if future is None:
+            return self._run(name)
+        return future.result()
+
+    def time_saved(self):
+        """
+        Returns (wall_seconds, saved_seconds) for the checks completed so far,
+        where saved is the summed check time minus the elapsed wall-clock time.
+        """
+        wall = time.perf_counter() - self._started
+        return wall, max(0.0, sum(self.timings.values()) - wall)
+
+def get_existing_article(db_manager, title, content, source_url=None, user_id=None):
+    """Check if an article already exists for the given (or current) user."""
     try:
-        from flask import session
-        user_id = session.get('user_id')
+        if user_id is None:
+            from flask import session
+            user_id = session.get('user_id')
         
         if not user_id:
             return None
@@ -111,11 +213,8 @@ def get_existing_article(db_manager, title, content, source_url=None):
                 session_db.close()
                 return result
         
-        # Check by title and content similarity (for user's articles only)
-        existing = query.filter(
-            ArticleModel.title == title,
-            ArticleModel.content == content
-        ).first()
+        # Check by content hash (for user's articles only)
+        existing = DatabaseManager.find_duplicate_article(session_db, user_id, title, content)
         
         if existing:
             result = {
@@ -0,0 +1,322 @@
+"""
+Durable background job queue for TruthGuard.
+
+Jobs are stored in a small SQLite database next to the main one, so queued
+work survives restarts. Workers claim jobs with a lease that a heartbeat
+renews while the job runs; a job whose worker died (lease expired) is picked
+up again by the next claim. Failed attempts are retried with exponential
+backoff until max_attempts is reached. Handlers can record progress events,
+which are stored with the job so any process can relay them.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+# Lease on a claimed job; the worker's heartbeat renews it every third of this
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '300'))
+JOB_RETENTION_HOURS = int(os.getenv('JOB_RETENTION_HOURS', '24'))
+
+
+class RetryableJobError(Exception):
+    """Raised by a job handler for a transient failure.
+
+    `result` is stored as the job's final result if no attempts are left.
+    """
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+def get_jobs_db_path():
+    """Get the path to the SQLite job queue file (JOBS_DB_PATH overrides it)."""
+    if os.getenv('JOBS_DB_PATH'):
+        return os.getenv('JOBS_DB_PATH')
+    db_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+    os.makedirs(db_dir, exist_ok=True)
+    return os.path.join(db_dir, 'jobs.db')
+
+
+class JobQueue:
+    """SQLite-backed job queue with leases, retries and crash recovery."""
+
+    def __init__(self, db_path=None, max_attempts=JOB_MAX_ATTEMPTS, lease_seconds=JOB_LEASE_SECONDS):
+        self.db_path = db_path or get_jobs_db_path()
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id INTEGER,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    available_at REAL NOT NULL,
+                    lease_expires REAL,
+                    progress TEXT
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_jobs_status_available ON jobs (status, available_at)"
+            )
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'progress' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN progress TEXT")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, payload, user_id=None):
+        """Add a job and return its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, user_id, payload, max_attempts, created_at, updated_at, available_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, json.dumps(payload), self.max_attempts, now, now, now)
+            )
+        return job_id
+
+    def claim(self, worker):
+        """
+        Atomically take the oldest runnable job, or return None.
+
+        Runnable means queued and due, or running with an expired lease (its
+        worker crashed or the process restarted mid-job).
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs "
+                "WHERE (status = 'queued' AND available_at <= ?) "
+                "   OR (status = 'running' AND lease_expires < ?) "
+                "ORDER BY available_at LIMIT 1",
+                (now, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            if row['status'] == 'running' and row['attempts'] >= row['max_attempts']:
+                # The last attempt never reported back; give up on it
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                    ('Lease expired on final attempt', now, row['id'])
+                )
+                conn.execute("COMMIT")
+                return self.claim(worker)
+
+            # Each attempt starts with a fresh progress log
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, "
+                "lease_expires = ?, progress = '[]', updated_at = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row['id'])
+            )
+            conn.execute("COMMIT")
+            job = self._row_to_job(row)
+            job['status'] = 'running'
+            job['attempts'] += 1
+            job['worker'] = worker
+            job['progress'] = []
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def renew(self, job_id, worker):
+        """Extend the lease of a job this worker is still running. Returns False if it lost the job."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time() + self.lease_seconds, job_id, worker)
+            )
+        return cursor.rowcount == 1
+
+    def add_progress(self, job_id, event, data):
+        """Append a progress event to the running job's log."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None:
+                progress = json.loads(row['progress'] or '[]')
+                progress.append([event, data])
+                conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def complete(self, job_id, result):
+        """Mark a job as done and store its result."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job_id)
+            )
+
+    def fail(self, job_id, error, result=None):
+        """
+        Record a failed attempt. The job is re-queued with exponential backoff
+        while attempts remain; otherwise it is finished, as 'done' with `result`
+        when one is given or as 'failed'.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            if row['attempts'] < row['max_attempts']:
+                delay = 2 ** row['attempts']
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, available_at = ?, "
+                    "lease_expires = NULL, updated_at = ? WHERE id = ?",
+                    (str(error), now + delay, now, job_id)
+                )
+            elif result is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'done', result = ?, error = ?, lease_expires = NULL, "
+                    "updated_at = ? WHERE id = ?",
+                    (json.dumps(result), str(error), now, job_id)
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, lease_expires = NULL, updated_at = ? WHERE id = ?",
+                    (str(error), now, job_id)
+                )
+
+    def get(self, job_id):
+        """Get a job by id as a dict, or None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def purge(self, older_than_hours=JOB_RETENTION_HOURS):
+        """Delete finished jobs older than the retention window."""
+        cutoff = time.time() - older_than_hours * 3600
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (cutoff,)
+            )
+
+    @staticmethod
+    def _row_to_job(row):
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['progress'] = json.loads(job['progress']) if job.get('progress') else []
+        return job
+
+
+class JobWorkerPool:
+    """
+    Background threads that claim jobs and run `handler(payload, user_id, progress)`,
+    where `progress(event, data)` records a progress event on the job.
+
+    The handler's return value becomes the job result. RetryableJobError and
+    unexpected exceptions count as failed attempts. A heartbeat thread renews
+    the lease of every running job, so slow jobs are not claimed twice.
+    """
+
+    def __init__(self, queue, handler, workers=JOB_WORKERS, poll_interval=0.5):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._running = {}  # job_id -> worker, for the heartbeat
+        self._running_lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        with self._lock:
+            if self._threads:
+                return
+            self.queue.purge()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                t.start()
+                self._threads.append(t)
+            t = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout=None):
+        """Ask the workers to exit after their current job."""
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        self._stop.clear()
+
+    def _work(self):
+        worker = f'{os.getpid()}:{threading.current_thread().name}'
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(worker)
+            except Exception as e:
+                print(f"Error claiming job: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+
+            with self._running_lock:
+                self._running[job['id']] = worker
+            try:
+                result = self.handler(job['payload'], job['user_id'], self._progress_recorder(job['id']))
+                self.queue.complete(job['id'], result)
+            except RetryableJobError as e:
+                self.queue.fail(job['id'], e, e.result)
+            except Exception as e:
+                print(f"Error processing job {job['id']}: {e}")
+                self.queue.fail(job['id'], e)
+            finally:
+                with self._running_lock:
+                    self._running.pop(job['id'], None)
+
+    def _progress_recorder(self, job_id):
+        def progress(event, data):
+            try:
+                self.queue.add_progress(job_id, event, data)
+            except Exception as e:
+                # Progress is best effort; never fail the job over it
+                print(f"Error recording progress for job {job_id}: {e}")
+        return progress
+
+    def _heartbeat(self):
+        interval = max(1.0, self.queue.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            with self._running_lock:
+                running = list(self._running.items())
+            for job_id, worker in running:
+                try:
+                    self.queue.renew(job_id, worker)
+                except Exception as e:
+                    print(f"Error renewing lease of job {job_id}: {e}")
@@ -0,0 +1,372 @@
+"""
+Single entry point for Gemini calls.
+
+Every stage of the detector (and the game generator) goes through
+generate(), so the backend mode in recordings.py applies everywhere.
+
+Clients are pooled: one GenerativeServiceClient (and its gRPC channel) per
+API key and one GenerativeModel per (key, model), created once and shared by
+all threads. Keys are registered by name with configure(), so the detector
+and the game can use different keys side by side. Each call carries a
+deadline (LLM_TIMEOUT_SECONDS unless overridden).
+
+Which model serves a stage comes from the routing table in model_routing.py;
+if a model errors or times out, the next one in the stage's cascade is
+tried.
+
+Every (API key, model) pair has its own adaptive token-bucket limiter and
+circuit breaker (see resilience.py), as Gemini quotas are per model. 429 and 5xx replies are retried with jittered
+exponential backoff within the deadline; when retries are exhausted, the
+deadline passes or the breaker is open, LLMUnavailableError is raised so
+callers can report the outage instead of inventing a result.
+
+Successful replies are cached by (model, generation config, prompt) in
+llm_cache.py; pass cache=False for calls that must be fresh.
+
+The latency of every live call is tracked per stage (llm_latency). With
+hedging enabled, a call in one of LLM_HEDGE_STAGES that has not answered
+by the LLM_HEDGE_PERCENTILE of that stage's recent latency gets a duplicate
+request, and the first reply wins. Hedges are capped at LLM_HEDGE_MAX_RATE
+of eligible calls.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
+from google.api_core import retry as api_retry
+
+import model_routing
+import recordings
+from llm_cache import LLMCache, LLM_CACHE_ENABLED, make_key as cache_key_for
+from metrics import StageMetrics, percentile
+from resilience import TokenBucket, CircuitBreaker, HedgeBudget, backoff_delay
+
+DEFAULT_MODEL = model_routing.DEFAULT_MODEL
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '60'))
+LLM_WARMUP = os.getenv('LLM_WARMUP', 'true').lower() == 'true'
+
+# Per-key limits; LLM_RATE_PER_MINUTE_<NAME> (e.g. _GAME) overrides the rate for one key
+LLM_RATE_PER_MINUTE = float(os.getenv('LLM_RATE_PER_MINUTE', '240'))
+LLM_BURST = int(os.getenv('LLM_BURST', '20'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))
+LLM_RETRY_BASE_SECONDS = float(os.getenv('LLM_RETRY_BASE_SECONDS', '0.5'))
+LLM_RETRY_MAX_SECONDS = float(os.getenv('LLM_RETRY_MAX_SECONDS', '8'))
+LLM_BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', '5'))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv('LLM_BREAKER_COOLDOWN_SECONDS', '30'))
+
+# Request hedging for slow-tail stages (off by default)
+LLM_HEDGING_ENABLED = os.getenv('LLM_HEDGING_ENABLED', 'false').lower() == 'true'
+LLM_HEDGE_STAGES = {s.strip() for s in os.getenv('LLM_HEDGE_STAGES', 'summary,factuality').split(',') if s.strip()}
+LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', '95'))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+LLM_HEDGE_MAX_RATE = float(os.getenv('LLM_HEDGE_MAX_RATE', '0.05'))
+LLM_HEDGE_WORKERS = int(os.getenv('LLM_HEDGE_WORKERS', '16'))
+
+# Throttling (429) and server-side (5xx, deadline) failures worth retrying
+_THROTTLED = (api_exceptions.TooManyRequests, api_exceptions.ResourceExhausted)
+_RETRYABLE = _THROTTLED + (api_exceptions.ServerError, ConnectionError, TimeoutError)
+
+_lock = threading.Lock()
+_api_keys = {}
+_clients = {}
+_models = {}
+_guards = {}
+_fallbacks = {}
+
+# Live mode only: replayed runs must stay deterministic, and recordings must
+# capture real Gemini replies and latencies rather than cache hits
+reply_cache = LLMCache(enabled=LLM_CACHE_ENABLED and recordings.BACKEND_MODE == 'live')
+
+# Latency of individual live Gemini requests, per stage
+llm_latency = StageMetrics()
+
+hedge_budget = HedgeBudget(LLM_HEDGE_MAX_RATE)
+_hedge_executor = ThreadPoolExecutor(max_workers=LLM_HEDGE_WORKERS, thread_name_prefix='llm-hedge')
+_hedge_counts = {'hedged': 0, 'hedge_wins': 0}
+
+
+class LLMUnavailableError(RuntimeError):
+    """Gemini cannot be reached right now (throttled, failing or circuit open)."""
+
+
+class _QuotaGuard:
+    """Limiter, breaker and counters for one (API key, model) pair."""
+
+    def __init__(self, name, model):
+        rate = float(os.getenv(f'LLM_RATE_PER_MINUTE_{name.upper()}', LLM_RATE_PER_MINUTE))
+        self.bucket = TokenBucket(rate / 60, LLM_BURST)
+        self.breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN_SECONDS)
+        self.names = {name}
+        self.model = model
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.unavailable = 0
+
+    def stats(self):
+        return dict(
+            keys=sorted(self.names), model=self.model, calls=self.calls, retries=self.retries,
+            throttled=self.throttled, unavailable=self.unavailable,
+            limiter=self.bucket.stats(), breaker=self.breaker.stats()
+        )
+
+
+def configure(api_key, name='default'):
+    """
+    Register an API key under `name` (not needed in replay mode). The
+    default key is also set on the genai module for anything using it directly.
+    """
+    if not api_key:
+        return
+    with _lock:
+        _api_keys[name] = api_key
+    if name == 'default':
+        genai.configure(api_key=api_key)
+
+
+def get_model(model=DEFAULT_MODEL, api_key_name='default'):
+    """Pooled GenerativeModel for a registered key, created on first use."""
+    with _lock:
+        api_key = _api_keys.get(api_key_name) or _api_keys.get('default')
+        if not api_key:
+            raise RuntimeError(f"No Gemini API key configured for '{api_key_name}'")
+        pooled = _models.get((api_key, model))
+        if pooled is None:
+            client = _clients.get(api_key)
+            if client is None:
+                client = glm.GenerativeServiceClient(client_options={'api_key': api_key})
+                _clients[api_key] = client
+            pooled = genai.GenerativeModel(model)
+            # GenerativeModel otherwise uses the process-wide default client
+            pooled._client = client
+            _models[(api_key, model)] = pooled
+        return pooled
+
+
+def _guard(api_key_name, model):
+    """The limiter/breaker for `model` on the key behind `api_key_name` (shared by names using one key)."""
+    with _lock:
+        api_key = _api_keys.get(api_key_name) or _api_keys.get('default')
+        guard = _guards.get((api_key, model))
+        if guard is None:
+            guard = _guards[(api_key, model)] = _QuotaGuard(api_key_name, model)
+        guard.names.add(api_key_name)
+        return guard
+
+
+def stats():
+    """Limiter, breaker and retry counters per API key and model, plus model fallbacks."""
+    with _lock:
+        guards = list(_guards.values())
+        fallbacks = dict(_fallbacks)
+    return {
+        'routes': model_routing.STAGE_MODELS,
+        'fallbacks': fallbacks,
+        'quotas': [guard.stats() for guard in guards]
+    }
+
+
+def hedge_stats():
+    """Hedging counters, budget usage and the per-stage request latency."""
+    with _lock:
+        counts = dict(_hedge_counts)
+    return dict(counts, enabled=LLM_HEDGING_ENABLED, budget=hedge_budget.stats(),
+                latency=llm_latency.snapshot())
+
+
+def warm_up(model=DEFAULT_MODEL):
+    """
+    Open the connection for every registered key in the background (a
+    count_tokens call, which is not billed), so the first real request does
+    not pay for DNS, TLS and channel setup.
+    """
+    if not LLM_WARMUP or recordings.BACKEND_MODE == 'replay':
+        return
+
+    def run():
+        with _lock:
+            names = list(_api_keys)
+        for name in names:
+            try:
+                get_model(model, name).count_tokens(
+                    'ping', request_options={'timeout': 10, 'retry': api_retry.Retry(timeout=10)}
+                )
+            except Exception as e:
+                print(f"Error warming up Gemini client '{name}': {e}")
+
+    threading.Thread(target=run, name='llm-warmup', daemon=True).start()
+
+
+# Failures after which the next model in the stage's cascade is tried
+_FALLBACK_ERRORS = (LLMUnavailableError, api_exceptions.GoogleAPICallError, recordings.RecordingNotFound)
+
+
+def generate(prompt, stage=None, model=None, generation_config=None,
+             api_key_name='default', timeout=None, cache=True):
+    """
+    Send `prompt` to Gemini and return the reply text.
+
+    `stage` names the pipeline step making the call and selects its model
+    cascade and generation budget from model_routing, unless `model` pins
+    one model. `generation_config` is merged over the stage's budget. `timeout`
+    overrides the per-call deadline in seconds (per model tried).
+    With cache=False the reply cache is neither read nor written.
+    Errors from the API, including deadline expiry, are raised to the caller.
+    Raises LLMUnavailableError when Gemini is throttling or failing.
+    """
+    models = [model] if model else model_routing.models_for(stage)
+    for i, name in enumerate(models):
+        try:
+            return _generate(prompt, stage, name, generation_config, api_key_name, timeout, cache)
+        except _FALLBACK_ERRORS as e:
+            if i == len(models) - 1:
+                raise
+            print(f"Gemini model {name} failed for stage {stage}, falling back to {models[i + 1]}: {e}")
+            with _lock:
+                _fallbacks[stage] = _fallbacks.get(stage, 0) + 1
+
+
+def _generate(prompt, stage, model, generation_config, api_key_name, timeout, cache):
+    generation_config = model_routing.generation_config_for(stage, model, generation_config)
+    key = recordings.recording_key('llm', model, generation_config or {}, prompt)
+    if recordings.BACKEND_MODE == 'replay':
+        return recordings.replay('llm', key)['response']
+
+    start = time.perf_counter()
+    cache_key = cache_key_for(model, generation_config, prompt) if cache else None
+    text = reply_cache.get(cache_key) if cache else None
+    if text is None:
+        call = (get_model(model, api_key_name), _guard(api_key_name, model), prompt,
+                generation_config, timeout or LLM_TIMEOUT_SECONDS)
+        if LLM_HEDGING_ENABLED and stage in LLM_HEDGE_STAGES:
+            text = _hedged_call(stage, call)
+        else:
+            text = _timed_call(stage, call)
+        if cache:
+            reply_cache.put(cache_key, text, model, stage)
+
+    if recordings.BACKEND_MODE == 'record':
+        recordings.save('llm', key, {
+            'stage': stage,
+            'model': model,
+            'generation_config': generation_config,
+            'prompt': prompt,
+            'response': text
+        }, time.perf_counter() - start)
+    return text
+
+
+def _timed_call(stage, call):
+    start = time.perf_counter()
+    text = _call_with_retries(*call)
+    llm_latency.record(stage or 'unknown', time.perf_counter() - start)
+    return text
+
+
+def _hedged_call(stage, call):
+    """
+    Run the call; if it is still pending after the stage's hedge delay, fire
+    one duplicate (budget permitting) and return whichever succeeds first.
+    The slower request is left to finish in the background.
+
+    The primary never waits in the hedge pool, so the delay counts from when
+    it actually starts and the pool size caps hedges only: it runs on the
+    caller's thread when no hedge is possible yet, and otherwise on a thread
+    of its own, so that a winning hedge can be returned without waiting for
+    it.
+    """
+    hedge_budget.eligible()
+    samples = llm_latency.samples(stage)
+    delay = percentile(samples, LLM_HEDGE_PERCENTILE) if len(samples) >= LLM_HEDGE_MIN_SAMPLES else None
+    if delay is None:
+        return _timed_call(stage, call)
+
+    primary = Future()
+
+    def run_primary():
+        try:
+            primary.set_result(_timed_call(stage, call))
+        except BaseException as e:
+            primary.set_exception(e)
+
+    threading.Thread(target=run_primary, name='llm-primary', daemon=True).start()
+    done, _ = wait([primary], timeout=delay)
+    if done or not hedge_budget.try_hedge():
+        return primary.result()
+
+    hedge = _hedge_executor.submit(_timed_call, stage, call)
+    with _lock:
+        _hedge_counts['hedged'] += 1
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    with _lock:
+                        _hedge_counts['hedge_wins'] += 1
+                return future.result()
+            error = error or future.exception()
+    raise error
+
+
+def _call_with_retries(pooled, guard, prompt, generation_config, deadline):
+    expires = time.monotonic() + deadline
+    if not guard.breaker.allow():
+        with _lock:
+            guard.unavailable += 1
+        raise LLMUnavailableError(
+            f"Gemini is unavailable; retrying in {guard.breaker.retry_after():.0f}s"
+        )
+
+    attempt = 0
+    while True:
+        remaining = expires - time.monotonic()
+        if remaining <= 0 or not guard.bucket.acquire(timeout=remaining):
+            guard.breaker.cancel_trial()
+            with _lock:
+                guard.unavailable += 1
+            raise LLMUnavailableError("Timed out waiting for the Gemini rate limit")
+
+        with _lock:
+            guard.calls += 1
+        try:
+            reply = pooled.generate_content(
+                prompt,
+                generation_config=generation_config,
+                # Retries are handled here, not by the client
+                request_options={'timeout': max(remaining, 0.1), 'retry': None}
+            )
+            text = reply.text
+        except _RETRYABLE as e:
+            if isinstance(e, _THROTTLED):
+                guard.bucket.throttled()
+            delay = backoff_delay(attempt, LLM_RETRY_BASE_SECONDS, LLM_RETRY_MAX_SECONDS)
+            with _lock:
+                guard.throttled += isinstance(e, _THROTTLED)
+                if attempt >= LLM_MAX_RETRIES or time.monotonic() + delay >= expires:
+                    guard.unavailable += 1
+                    give_up = True
+                else:
+                    guard.retries += 1
+                    give_up = False
+            if give_up:
+                guard.breaker.record_failure()
+                raise LLMUnavailableError(f"Gemini call failed after {attempt + 1} attempt(s): {e}") from e
+            attempt += 1
+            time.sleep(delay)
+            continue
+        except Exception:
+            # Upstream answered (e.g. invalid request or blocked reply): it is healthy
+            guard.breaker.record_success()
+            raise
+
+        guard.breaker.record_success()
+        guard.bucket.succeeded()
+        return text
@@ -0,0 +1,176 @@
+"""
+Prompt-level cache of Gemini replies.
+
+Replies are keyed by a hash of the model, the generation config and the exact
+prompt, and kept in a small SQLite database next to the main one so they
+survive restarts. The database is created on first use, not at import. A bounded in-memory LRU sits in front of it for hot
+prompts. Entries expire after a TTL, and the least recently used ones are
+evicted once the store exceeds its size limit.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_TTL_HOURS = float(os.getenv('LLM_CACHE_TTL_HOURS', '168'))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '20000'))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', '512'))
+
+
+def get_llm_cache_path():
+    """Get the path to the SQLite reply cache file (LLM_CACHE_PATH overrides it)."""
+    if os.getenv('LLM_CACHE_PATH'):
+        return os.getenv('LLM_CACHE_PATH')
+    db_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+    os.makedirs(db_dir, exist_ok=True)
+    return os.path.join(db_dir, 'llm_cache.db')
+
+
+def make_key(model, generation_config, prompt):
+    """Cache key of one Gemini request."""
+    h = hashlib.sha256()
+    for part in (model, json.dumps(generation_config or {}, sort_keys=True, default=str), prompt):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class LLMCache:
+    """SQLite-backed reply cache with an in-memory LRU front."""
+
+    def __init__(self, db_path=None, enabled=LLM_CACHE_ENABLED, ttl_hours=LLM_CACHE_TTL_HOURS,
+                 max_entries=LLM_CACHE_MAX_ENTRIES, memory_entries=LLM_CACHE_MEMORY_ENTRIES):
+        self.enabled = enabled
+        self._db_path = db_path
+        self._schema_ready = False
+        self.ttl = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def db_path(self):
+        if self._db_path is None:
+            self._db_path = get_llm_cache_path()
+        return self._db_path
+
+    def _ensure_schema(self):
+        with closing(sqlite3.connect(self.db_path, timeout=30, isolation_level=None)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_replies (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    stage TEXT,
+                    reply TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_llm_replies_last_accessed ON llm_replies (last_accessed)"
+            )
+
+    def _connect(self):
+        if not self._schema_ready:
+            with self._lock:
+                if not self._schema_ready:
+                    self._ensure_schema()
+                    self._schema_ready = True
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _remember(self, key, reply, created_at):
+        # Caller holds self._lock
+        self._memory[key] = (reply, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached reply for `key`, or None."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT reply, created_at FROM llm_replies WHERE key = ? AND created_at > ?",
+                    (key, now - self.ttl)
+                ).fetchone()
+                if row:
+                    conn.execute("UPDATE llm_replies SET last_accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"Error reading LLM cache: {e}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key, reply, model, stage=None):
+        """Store a reply and evict expired/excess entries every so often."""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, reply, now)
+            self._puts_since_evict += 1
+            evict = self._puts_since_evict >= 100
+            if evict:
+                self._puts_since_evict = 0
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_replies (key, model, stage, reply, created_at, last_accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, stage, reply, now, now)
+                )
+                if evict:
+                    self._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"Error writing LLM cache: {e}")
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM llm_replies WHERE created_at <= ?", (now - self.ttl,))
+        conn.execute(
+            "DELETE FROM llm_replies WHERE key IN ("
+            "  SELECT key FROM llm_replies ORDER BY last_accessed DESC LIMIT -1 OFFSET ?"
+            ")",
+            (self.max_entries,)
+        )
+
+    def stats(self):
+        """Hit/miss counters since startup."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / total, 4) if total else 0.0,
+                'memory_entries': len(self._memory)
+            }
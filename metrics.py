@@ -0,0 +1,89 @@
+"""
+Per-stage latency metrics for the detector pipeline.
+
+Each stage keeps a sliding window of its most recent durations, from which
+percentiles are computed on demand. The module-level stage_metrics registry
+is shared by the app, the admin stats endpoint and the benchmarks.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+METRICS_WINDOW = int(os.getenv('METRICS_WINDOW', '2000'))
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class StageMetrics:
+    """Thread-safe registry of recent stage durations (in seconds)."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(int)
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._samples[stage].append(seconds)
+            self._counts[stage] += 1
+
+    @contextmanager
+    def timed(self, stage):
+        """Context manager recording the duration of its block under `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def measured(self, stage, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs), recording its duration under `stage`."""
+        with self.timed(stage):
+            return fn(*args, **kwargs)
+
+    def samples(self, stage):
+        with self._lock:
+            return list(self._samples.get(stage, ()))
+
+    def percentile(self, stage, pct):
+        """Recent `pct` percentile duration of a stage in seconds, or None."""
+        return percentile(self.samples(stage), pct)
+
+    def snapshot(self):
+        """Count and p50/p95/p99/mean/max in milliseconds for every stage."""
+        with self._lock:
+            stages = {stage: list(values) for stage, values in self._samples.items()}
+            counts = dict(self._counts)
+        return {stage: summarize(values, counts[stage]) for stage, values in sorted(stages.items())}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+
+def summarize(values, count=None):
+    """Latency summary (milliseconds) of a list of durations in seconds."""
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+    return {
+        'count': len(values) if count is None else count,
+        'p50_ms': ms(percentile(values, 50)),
+        'p95_ms': ms(percentile(values, 95)),
+        'p99_ms': ms(percentile(values, 99)),
+        'mean_ms': ms(sum(values) / len(values)) if values else None,
+        'max_ms': ms(max(values)) if values else None
+    }
+
+
+stage_metrics = StageMetrics()
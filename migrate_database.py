@@ -11,7 +11,9 @@ from sqlalchemy.exc import OperationalError
 from datetime import datetime
 
 def get_db_path():
-    """Get the path to the SQLite database file."""
+    """Get the path to the SQLite database file (DATABASE_PATH overrides it)."""
+    if os.getenv('DATABASE_PATH'):
+        return os.getenv('DATABASE_PATH')
     db_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
     return os.path.join(db_dir, 'truthguard.db')
 
@@ -25,8 +27,10 @@ def backup_database():
     backup_path = f"{db_path}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
     try:
-        import shutil
-        shutil.copy2(db_path, backup_path)
+        # Use SQLite's online backup so pages still in the WAL file are included
+        from contextlib import closing
+        with closing(sqlite3.connect(db_path)) as source, closing(sqlite3.connect(backup_path)) as target:
+            source.backup(target)
         print(f"✅ Database backed up to: {backup_path}")
         return backup_path
     except Exception as e:
@@ -73,26 +77,48 @@ def migrate_articles_table(engine):
             print(f"❌ Error adding user_id column: {e}")
             raise
 
+def add_content_hash_column(engine):
+    """Add the content_sha256 column to articles table if it doesn't exist."""
+    print("🔄 Checking articles content hash column...")
+    
+    if check_column_exists(engine, 'articles', 'content_sha256'):
+        print("✅ content_sha256 column already exists in articles table")
+        return True
+    
+    try:
+        with engine.connect() as conn:
+            print("➕ Adding content_sha256 column to articles table...")
+            conn.execute(text("ALTER TABLE articles ADD COLUMN content_sha256 VARCHAR(64)"))
+            print("✅ content_sha256 column added successfully")
+            conn.commit()
+            return True
+            
+    except OperationalError as e:
+        if "duplicate column name" in str(e).lower():
+            print("✅ content_sha256 column already exists")
+            return True
+        else:
+            print(f"❌ Error adding content_sha256 column: {e}")
+            raise
+
 def update_unique_constraint(engine):
-    """Update the unique constraint to include user_id."""
+    """Drop the unique constraint over whole article bodies (replaced by the content hash index)."""
     print("🔄 Updating unique constraints...")
     
     try:
         with engine.connect() as conn:
             # SQLite doesn't support modifying constraints directly
-            # We need to recreate the table with the new constraint
+            # We need to recreate the table without the old constraint
             
             # Check if the table needs recreation
             inspector = inspect(engine)
             constraints = inspector.get_unique_constraints('articles')
             
-            # Check if we already have the correct constraint
-            for constraint in constraints:
-                if set(constraint['column_names']) == {'title', 'content', 'user_id'}:
-                    print("✅ Unique constraint already updated")
-                    return True
+            if not any('content' in constraint['column_names'] for constraint in constraints):
+                print("✅ Unique constraint already updated")
+                return True
             
-            print("🔄 Recreating articles table with updated constraints...")
+            print("🔄 Recreating articles table without the title/content constraint...")
             
             # Create new table with correct schema
             conn.execute(text("""
@@ -101,6 +127,7 @@ def update_unique_constraint(engine):
                     title VARCHAR(255) NOT NULL,
                     link VARCHAR(2048),
                     content TEXT,
+                    content_sha256 VARCHAR(64),
                     summary TEXT,
                     input_type VARCHAR(10) NOT NULL,
                     analysis_date DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -108,16 +135,17 @@ def update_unique_constraint(engine):
                     factuality_level VARCHAR(50),
                     factuality_description TEXT,
                     user_id INTEGER,
-                    UNIQUE(title, content, user_id),
                     FOREIGN KEY(user_id) REFERENCES users(id)
                 )
             """))
             
             # Copy data from old table
             conn.execute(text("""
-                INSERT INTO articles_new 
-                SELECT id, title, link, content, summary, input_type, 
-                       analysis_date, factuality_score, factuality_level, 
+                INSERT INTO articles_new (id, title, link, content, content_sha256, summary, input_type,
+                                          analysis_date, factuality_score, factuality_level,
+                                          factuality_description, user_id)
+                SELECT id, title, link, content, content_sha256, summary, input_type,
+                       analysis_date, factuality_score, factuality_level,
                        factuality_description, user_id
                 FROM articles
             """))
@@ -134,6 +162,61 @@ def update_unique_constraint(engine):
         print(f"❌ Error updating constraints: {e}")
         raise
 
+def backfill_content_hashes(engine, batch_size=500):
+    """Fill content_sha256 for articles stored before the column existed."""
+    print("🔄 Backfilling article content hashes...")
+    
+    try:
+        from models import Article
+        
+        with engine.connect() as conn:
+            # Hashes already taken per user; a later copy of the same content keeps a NULL
+            # hash so the unique index can still be created (nothing is deleted)
+            result = conn.execute(text(
+                "SELECT user_id, content_sha256 FROM articles WHERE content_sha256 IS NOT NULL"
+            ))
+            seen = {(row[0], row[1]) for row in result.fetchall()}
+            
+            filled = duplicates = 0
+            last_id = 0
+            while True:
+                rows = conn.execute(text("""
+                    SELECT id, user_id, content FROM articles
+                    WHERE id > :last_id AND content_sha256 IS NULL
+                    ORDER BY id LIMIT :limit
+                """), {"last_id": last_id, "limit": batch_size}).fetchall()
+                if not rows:
+                    break
+                
+                updates = []
+                for article_id, user_id, content in rows:
+                    content_sha256 = Article.hash_content(content)
+                    if content_sha256 is None:
+                        continue
+                    if (user_id, content_sha256) in seen:
+                        duplicates += 1
+                        continue
+                    seen.add((user_id, content_sha256))
+                    updates.append({"id": article_id, "content_sha256": content_sha256})
+                
+                if updates:
+                    conn.execute(text("UPDATE articles SET content_sha256 = :content_sha256 WHERE id = :id"),
+                                 updates)
+                filled += len(updates)
+                last_id = rows[-1][0]
+            
+            conn.commit()
+        
+        print(f"✅ Backfilled {filled} content hashes")
+        if duplicates:
+            print(f"⚠️  {duplicates} articles duplicate an earlier article of the same user; "
+                  "their content_sha256 was left empty")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error backfilling content hashes: {e}")
+        raise
+
 def migrate_feedback_table(engine):
     """Add user_id column to feedback table if it doesn't exist."""
     print("🔄 Checking feedback table migration...")
@@ -240,6 +323,39 @@ def assign_articles_to_first_user(engine):
         print(f"❌ Error assigning articles to users: {e}")
         raise
 
+def create_missing_indexes(engine):
+    """Create the secondary indexes declared on the models that an existing database lacks."""
+    print("🔄 Checking secondary indexes...")
+    
+    try:
+        from models import Base
+        inspector = inspect(engine)
+        tables = set(inspector.get_table_names())
+        created = 0
+        
+        with engine.connect() as conn:
+            for table in Base.metadata.sorted_tables:
+                if table.name not in tables:
+                    continue
+                existing = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name in existing:
+                        continue
+                    print(f"➕ Creating index {index.name}...")
+                    index.create(conn)
+                    created += 1
+            conn.commit()
+        
+        if created:
+            print(f"✅ Created {created} indexes")
+        else:
+            print("✅ All indexes already exist")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error creating indexes: {e}")
+        raise
+
 def verify_migration(engine):
     """Verify that the migration was successful."""
     print("🔍 Verifying migration...")
@@ -295,8 +411,12 @@ def run_migration():
         migrations = [
             ("Articles table migration", migrate_articles_table),
             ("Feedback table migration", migrate_feedback_table),
+            ("Content hash column", add_content_hash_column),
             ("Unique constraint update", update_unique_constraint),
             ("Article user assignment", assign_articles_to_first_user),
+            ("Content hash backfill", backfill_content_hashes),
+            # After the table rebuild above, which drops the articles indexes
+            ("Secondary indexes", create_missing_indexes),
             ("Migration verification", verify_migration)
         ]
         
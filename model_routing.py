@@ -0,0 +1,82 @@
+"""
+Per-stage Gemini model routing.
+
+STAGE_MODELS maps each pipeline stage to a cascade of models: the first one
+serves the stage and the others are tried in order when it errors or times
+out. Yes/no gate checks and titles go to a small, low-latency model, while
+factuality scoring gets the strongest one.
+
+Override a stage with LLM_MODEL_<STAGE>, e.g.
+LLM_MODEL_FACTUALITY="gemini-2.5-pro,gemini-2.5-flash". Stages without an
+entry use LLM_DEFAULT_MODEL.
+
+STAGE_GENERATION holds each stage's generation budget (output token cap,
+stop sequences, temperature, candidate count), so short answers such as
+"Yes"/"No" are not allowed to ramble. Settings passed by the caller (e.g. a
+JSON response type) are merged on top.
+"""
+
+import os
+
+DEFAULT_MODEL = os.getenv('LLM_DEFAULT_MODEL', 'gemini-2.0-flash')
+FAST_MODEL = os.getenv('LLM_FAST_MODEL', 'gemini-2.0-flash-lite')
+STRONG_MODEL = os.getenv('LLM_STRONG_MODEL', 'gemini-2.5-flash')
+
+_DEFAULT_ROUTES = {
+    'political': [FAST_MODEL, DEFAULT_MODEL],
+    'safety': [FAST_MODEL, DEFAULT_MODEL],
+    'title': [FAST_MODEL, DEFAULT_MODEL],
+    'summary': [DEFAULT_MODEL, FAST_MODEL],
+    'factuality': [STRONG_MODEL, DEFAULT_MODEL],
+    'bundle': [DEFAULT_MODEL, STRONG_MODEL],
+    'game': [DEFAULT_MODEL, FAST_MODEL],
+}
+
+
+def _route(stage, default):
+    override = os.getenv(f'LLM_MODEL_{stage.upper()}')
+    models = [m.strip() for m in override.split(',')] if override else default
+    # Drop blanks and repeats (e.g. when an override equals the fallback)
+    return list(dict.fromkeys(m for m in models if m))
+
+
+STAGE_MODELS = {stage: _route(stage, models) for stage, models in _DEFAULT_ROUTES.items()}
+
+
+def models_for(stage):
+    """Model cascade for a stage, primary first."""
+    return STAGE_MODELS.get(stage) or [DEFAULT_MODEL]
+
+
+def routing_signature(*stages):
+    """Stable description of the models serving `stages` (for cache keys)."""
+    return ';'.join(f"{stage}={','.join(models_for(stage))}" for stage in stages)
+
+
+GENERATION_BUDGETS_ENABLED = os.getenv('LLM_GENERATION_BUDGETS_ENABLED', 'true').lower() == 'true'
+
+STAGE_GENERATION = {
+    'political': {'max_output_tokens': 4, 'stop_sequences': ['\n'], 'temperature': 0.0, 'candidate_count': 1},
+    'safety': {'max_output_tokens': 4, 'stop_sequences': ['\n'], 'temperature': 0.0, 'candidate_count': 1},
+    'title': {'max_output_tokens': 32, 'stop_sequences': ['\n'], 'temperature': 0.2, 'candidate_count': 1},
+    'summary': {'max_output_tokens': 256, 'temperature': 0.2, 'candidate_count': 1},
+    # Level line plus five breakdown points; stop before a sixth
+    'factuality': {'max_output_tokens': 768, 'stop_sequences': ['\n6.'], 'temperature': 0.2,
+                   'candidate_count': 1},
+    'bundle': {'max_output_tokens': 1024, 'temperature': 0.2, 'candidate_count': 1},
+    'game': {'max_output_tokens': 4096, 'temperature': 0.9, 'candidate_count': 1},
+}
+
+# Models whose hidden "thinking" tokens count against max_output_tokens; a
+# tight cap would leave them with no visible answer, so only the other
+# settings apply to them
+_THINKING_MODEL_PREFIXES = ('gemini-2.5',)
+
+
+def generation_config_for(stage, model, overrides=None):
+    """Generation config for one call: the stage budget merged with the caller's settings."""
+    config = dict(STAGE_GENERATION.get(stage, {})) if GENERATION_BUDGETS_ENABLED else {}
+    if model.startswith(_THINKING_MODEL_PREFIXES):
+        config.pop('max_output_tokens', None)
+    config.update(overrides or {})
+    return config or None
@@ -1,9 +1,10 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Enum, ForeignKey, func, Boolean, JSON, UniqueConstraint
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Enum, ForeignKey, func, Boolean, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from datetime import datetime
 import os
 from werkzeug.security import generate_password_hash, check_password_hash
+from text_utils import content_digest
 
 # Create base class for declarative models
 Base = declarative_base()
@@ -16,6 +17,7 @@ class Article(Base):
     title = Column(String(255), nullable=False)
     link = Column(String(2048))
     content = Column(Text)
+    content_sha256 = Column(String(64))  # sha256 of the normalized content, for duplicate checks
     summary = Column(Text)
     input_type = Column(Enum('link', 'snippet', name='input_type_enum'), nullable=False)
     analysis_date = Column(DateTime, default=datetime.utcnow)
@@ -24,17 +26,27 @@ class Article(Base):
     factuality_description = Column(Text)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=True)  # Associate articles with users
     
-    # Add unique constraint to prevent duplicate articles per user
     __table_args__ = (
-        UniqueConstraint('title', 'content', 'user_id', name='uq_article_title_content_user'),
+        # One copy of each article per user (NULL hashes, i.e. empty content, don't conflict)
+        Index('uq_articles_user_id_content_sha256', 'user_id', 'content_sha256', unique=True),
+        # History pages: a user's articles, newest first
+        Index('ix_articles_user_id_analysis_date', 'user_id', 'analysis_date'),
+        # Duplicate check by source URL
+        Index('ix_articles_user_id_link', 'user_id', 'link'),
+        Index('ix_articles_analysis_date', 'analysis_date'),
     )
     
     # Relationship with Breakdowns
-    breakdowns = relationship("Breakdown", back_populates="article")
+    breakdowns = relationship("Breakdown", back_populates="article", order_by="Breakdown.number")
     
     # Relationship with User
     user = relationship("User", back_populates="articles")
     
+    @staticmethod
+    def hash_content(content):
+        """Value of content_sha256 for the given article text (None when empty)."""
+        return content_digest(content) if content and content.strip() else None
+    
     def __repr__(self):
         return f"<Article(title='{self.title}', factuality_score={self.factuality_score}, user_id={self.user_id})>"
 
@@ -48,6 +60,10 @@ class Breakdown(Base):
     number = Column(Integer, nullable=False)
     explanation = Column(Text, nullable=False)
     
+    __table_args__ = (
+        Index('ix_breakdowns_article_id_number', 'article_id', 'number'),
+    )
+    
     # Relationship with Article
     article = relationship("Article", back_populates="breakdowns")
     
@@ -69,6 +85,26 @@ class Feedback(Base):
         return f"<Feedback(id={self.id}, rating={self.rating}, date={self.submission_date})>"
 
 
+class AnalysisCacheEntry(Base):
+    """Model for the shared, content-addressed analysis cache (see analysis_cache.py)."""
+    __tablename__ = 'analysis_cache'
+    
+    id = Column(Integer, primary_key=True)
+    cache_key = Column(String(64), nullable=False, unique=True)  # sha256 of normalized content + analysis version
+    title = Column(String(255))  # Only set for automatically generated titles
+    summary = Column(Text, nullable=False)
+    factuality_score = Column(Integer)
+    factuality_level = Column(String(50))
+    factuality_description = Column(Text)
+    factuality_breakdown = Column(JSON)  # List of breakdown explanations
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed = Column(DateTime, default=datetime.utcnow)
+    hits = Column(Integer, default=0)
+    
+    def __repr__(self):
+        return f"<AnalysisCacheEntry(key='{self.cache_key[:12]}', hits={self.hits})>"
+
+
 class User(Base):
     """Model for storing user information for authentication."""
     __tablename__ = 'users'
@@ -135,6 +171,10 @@ class UserGameProgress(Base):
     user_answer = Column(Boolean)  # True for real, False for fake
     evidence_gathered = Column(JSON)  # Track which evidence user viewed
     
+    __table_args__ = (
+        Index('ix_user_game_progress_user_id_level_id', 'user_id', 'level_id'),
+    )
+    
     # Relationships
     level = relationship("GameLevel", back_populates="user_progress")
     
@@ -152,6 +192,10 @@ class GameSession(Base):
     start_time = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
     
+    __table_args__ = (
+        Index('ix_game_sessions_user_id_is_active', 'user_id', 'is_active'),
+    )
+    
     def __repr__(self):
         return f"<GameSession(user_id={self.user_id}, level_id={self.level_id})>"
 
@@ -0,0 +1,182 @@
+"""
+Local fast path for the "is this Philippine political news?" gate.
+
+A weighted keyword/entity lexicon (English and Filipino) is turned into a
+logistic score in [0, 1]. Each category counts distinct matches, so repeating
+one name adds no evidence. Scores at or above POLITICAL_YES_THRESHOLD are a
+confident yes only when an unambiguous political entity is backed by a
+political term or Philippine context. Scores at or below
+POLITICAL_NO_THRESHOLD are a confident no only when there is positive
+non-political evidence (a non-political term and no political entity,
+agency or term): a text the lexicon knows nothing about is never rejected
+just for lacking hits.
+Everything else is sent to Gemini. Decisions are counted so the bypass rate
+can be monitored.
+
+The thresholds were set on the labelled sample in
+benchmarks/data/political_sample.jsonl (40 political, 32 non-political
+texts, including showbiz, sports, food and literature pieces naming
+political surnames, foreign politics, and agency stories with few lexicon
+hits). The highest-scoring corroborated non-political text scores 0.20; at
+the defaults the sample has no wrong confident answers and 22% of it skips
+Gemini. Re-check after changing the lexicon or weights with
+python benchmarks/calibrate_political.py.
+"""
+
+import math
+import os
+import re
+import threading
+
+POLITICAL_CLASSIFIER_ENABLED = os.getenv('POLITICAL_CLASSIFIER_ENABLED', 'true').lower() == 'true'
+POLITICAL_YES_THRESHOLD = float(os.getenv('POLITICAL_YES_THRESHOLD', '0.8'))
+POLITICAL_NO_THRESHOLD = float(os.getenv('POLITICAL_NO_THRESHOLD', '0.05'))
+
+# Philippine political institutions, offices, parties and politicians whose
+# names are rarely used for anyone else
+PH_POLITICAL_ENTITIES = [
+    'malacañang', 'malacanang', 'malakanyang', 'comelec', 'ombudsman', 'sandiganbayan', 'dilg', 'dbm',
+    'senate of the philippines', 'philippine senate', 'house of representatives',
+    'batasang pambansa', 'batasan', 'party-list', 'partylist', 'pdp-laban', 'lakas-cmd',
+    'nacionalista', 'liberal party', 'nationalist people\'s coalition', 'uniteam', 'akbayan',
+    'marcos', 'bongbong', 'duterte', 'robredo', 'romualdez', 'zubiri', 'escudero',
+    'hontiveros', 'arroyo', 'binay', 'trillanes', 'de lima', 'cayetano', 'dela rosa',
+    'pimentel', 'lacson', 'drilon', 'gatchalian', 'revilla', 'legarda', 'pangilinan',
+    'senado', 'kamara', 'kongreso', 'pangulo', 'bise presidente', 'senador', 'kongresista',
+    'mambabatas', 'palasyo',
+]
+
+# Surnames shared by politicians and celebrities, athletes, authors, streets
+# or businesses: weak evidence that never makes a confident yes on its own
+AMBIGUOUS_ENTITIES = [
+    'poe', 'recto', 'villar', 'aquino', 'estrada', 'pacquiao', 'imee', 'tolentino',
+    'tulfo', 'sotto', 'angara',
+]
+
+# Government departments and agencies: political evidence that blocks a
+# confident no, but too common in weather, sports and business news to make a
+# confident yes
+PH_AGENCIES = [
+    'dpwh', 'deped', 'ched', 'tesda', 'pnp', 'afp', 'nbi', 'bir', 'dof', 'doh', 'dfa', 'doj',
+    'dswd', 'dotr', 'dict', 'denr', 'doe', 'dole', 'dti', 'dnd', 'neda', 'nfa', 'bucor',
+    'bureau of customs', 'philhealth', 'coa', 'commission on audit', 'mtrcb', 'psc',
+    'department of agriculture', 'department of energy', 'department of health',
+    'department of education', 'department of justice', 'department of finance',
+]
+
+# General political vocabulary (not specific to the Philippines)
+POLITICAL_TERMS = [
+    'senate', 'senator', 'congress', 'congressman', 'congresswoman', 'lawmaker', 'lawmakers',
+    'legislator', 'legislation', 'bill', 'law', 'ordinance', 'impeachment', 'impeach',
+    'president', 'vice president', 'presidential', 'cabinet', 'secretary', 'government',
+    'administration', 'election', 'elections', 'electoral', 'vote', 'votes', 'voters',
+    'campaign', 'candidate', 'candidates', 'political', 'politician', 'politics', 'policy',
+    'budget', 'corruption', 'plunder', 'graft', 'mayor', 'governor', 'barangay', 'lgu',
+    'opposition', 'majority', 'minority', 'hearing', 'probe', 'resolution', 'constitution',
+    'charter change', 'cha-cha', 'martial law', 'red-tagging', 'state of the nation', 'sona',
+    'halalan', 'eleksyon', 'botante', 'kandidato', 'gobyerno', 'batas', 'pulitika', 'politiko',
+    'alkalde', 'gobernador', 'katiwalian', 'korapsyon', 'panukalang batas', 'pagdinig',
+    'imbestigasyon', 'administrasyon', 'pamahalaan', 'oposisyon', 'kalihim', 'konsehal',
+    'pondo ng bayan', 'kaban ng bayan', 'confidential funds', 'intelligence funds',
+    'senatorial', 'plenary', 'subpoena', 'bicameral', 'midterm', 'drug war', 'war on drugs',
+    'censorship',
+]
+
+# Philippine geographic/national context
+PH_CONTEXT = [
+    'philippines', 'philippine', 'filipino', 'filipinos', 'pilipinas', 'pilipino', 'pinoy',
+    'manila', 'metro manila', 'quezon city', 'makati', 'pasig', 'cebu', 'davao', 'iloilo',
+    'mindanao', 'luzon', 'visayas', 'bangsamoro', 'barmm', 'ncr', 'peso', 'pesos',
+]
+
+# Vocabulary typical of clearly non-political content
+NON_POLITICAL_TERMS = [
+    'recipe', 'ingredients', 'tablespoon', 'teaspoon', 'cooking', 'basketball', 'pba', 'nba',
+    'volleyball', 'boxing match', 'championship', 'playoffs', 'movie', 'film', 'box office',
+    'concert', 'album', 'song', 'lyrics', 'celebrity', 'showbiz', 'teleserye', 'actor',
+    'actress', 'fashion', 'skincare', 'makeup', 'smartphone', 'gadget', 'video game',
+    'gaming', 'horoscope', 'travel guide', 'hotel review', 'resort',
+]
+
+_WEIGHTS = {
+    'bias': -3.5,
+    'entities': 1.4,
+    'ambiguous': 0.4,
+    'agencies': 0.45,
+    'terms': 0.45,
+    'context': 0.7,
+    'non_political': -0.9,
+}
+# Distinct hits of one category stop adding evidence after this many
+_CAPS = {'entities': 3, 'ambiguous': 2, 'agencies': 2, 'terms': 8, 'context': 3, 'non_political': 5}
+
+
+def _compile(words):
+    alternation = '|'.join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+
+
+_PATTERNS = {
+    'entities': _compile(PH_POLITICAL_ENTITIES),
+    'ambiguous': _compile(AMBIGUOUS_ENTITIES),
+    'agencies': _compile(PH_AGENCIES),
+    'terms': _compile(POLITICAL_TERMS),
+    'context': _compile(PH_CONTEXT),
+    'non_political': _compile(NON_POLITICAL_TERMS),
+}
+
+_stats_lock = threading.Lock()
+_stats = {'yes': 0, 'no': 0, 'uncertain': 0}
+
+
+def features(text):
+    """Count distinct lexicon hits per category."""
+    return {
+        name: len({match.lower() for match in pattern.findall(text or '')})
+        for name, pattern in _PATTERNS.items()
+    }
+
+
+def political_score(text, counts=None):
+    """Probability-like score that the text is Philippine political news."""
+    counts = counts or features(text)
+    z = _WEIGHTS['bias'] + sum(
+        _WEIGHTS[name] * min(count, _CAPS[name]) for name, count in counts.items()
+    )
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+def classify(text, yes_threshold=None, no_threshold=None):
+    """
+    Returns True or False for confident cases and None when the text falls in
+    the uncertain band (the caller should then ask Gemini).
+    """
+    yes_threshold = POLITICAL_YES_THRESHOLD if yes_threshold is None else yes_threshold
+    no_threshold = POLITICAL_NO_THRESHOLD if no_threshold is None else no_threshold
+
+    counts = features(text)
+    score = political_score(text, counts)
+    # A confident yes needs an unambiguous entity corroborated by a political term or PH context
+    corroborated = counts['entities'] >= 1 and counts['terms'] + counts['context'] >= 1
+    # A confident no needs non-political evidence, not just an absence of political hits
+    non_political = (counts['non_political'] >= 1
+                     and counts['entities'] + counts['agencies'] + counts['terms'] == 0)
+    if score >= yes_threshold and corroborated:
+        verdict, key = True, 'yes'
+    elif score <= no_threshold and non_political:
+        verdict, key = False, 'no'
+    else:
+        verdict, key = None, 'uncertain'
+    with _stats_lock:
+        _stats[key] += 1
+    return verdict
+
+
+def stats():
+    """Decision counters and the share of checks that skipped Gemini."""
+    with _stats_lock:
+        counts = dict(_stats)
+    total = sum(counts.values())
+    counts['total'] = total
+    counts['bypass_rate'] = round((counts['yes'] + counts['no']) / total, 4) if total else 0.0
+    return counts
@@ -0,0 +1,85 @@
+"""
+Record/replay store for external calls (Gemini prompts and article pages).
+
+BACKEND_MODE selects how the LLM and fetch layers reach the outside world:
+
+* live   - call Gemini and download pages normally (default)
+* record - as live, and also save every prompt/response and URL/HTML pair
+           under RECORDINGS_DIR
+* replay - serve only saved recordings; no network access or API key needed
+
+In replay mode REPLAY_LATENCY_MS adds an artificial delay per call. It is
+either a number of milliseconds or "recorded" to reproduce the latency
+measured while recording.
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+BACKEND_MODE = os.getenv('BACKEND_MODE', 'live').lower()
+if BACKEND_MODE not in ('live', 'record', 'replay'):
+    raise ValueError(f"Unknown BACKEND_MODE: {BACKEND_MODE}")
+REPLAY_LATENCY_MS = os.getenv('REPLAY_LATENCY_MS', '0')
+
+
+class RecordingNotFound(LookupError):
+    """Raised in replay mode when a call has no saved recording."""
+
+
+def get_recordings_dir():
+    """Get the directory holding recordings."""
+    rec_dir = os.getenv('RECORDINGS_DIR') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'instance', 'recordings'
+    )
+    os.makedirs(rec_dir, exist_ok=True)
+    return rec_dir
+
+
+def recording_key(*parts):
+    """Stable key for a call made from its identifying parts."""
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, default=str)
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def _recording_path(kind, key):
+    kind_dir = os.path.join(get_recordings_dir(), kind)
+    os.makedirs(kind_dir, exist_ok=True)
+    return os.path.join(kind_dir, key + '.json')
+
+
+def save(kind, key, entry, elapsed):
+    """Save one recording (atomically). `elapsed` is the live call time in seconds."""
+    entry = dict(entry, elapsed_ms=round(elapsed * 1000, 1), recorded_at=datetime.utcnow().isoformat())
+    path = _recording_path(kind, key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error writing recording: {e}")
+
+
+def replay(kind, key):
+    """Return a saved recording after the configured latency, or raise RecordingNotFound."""
+    try:
+        with open(_recording_path(kind, key), encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        raise RecordingNotFound(f"No {kind} recording for key {key[:12]}")
+
+    if REPLAY_LATENCY_MS == 'recorded':
+        delay = entry.get('elapsed_ms', 0) / 1000
+    else:
+        delay = float(REPLAY_LATENCY_MS) / 1000
+    if delay > 0:
+        time.sleep(delay)
+    return entry
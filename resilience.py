@@ -0,0 +1,187 @@
+"""
+Outbound call protection: an adaptive token-bucket limiter, a circuit breaker
+and a budget for hedged requests.
+
+The limiter refills at a configured rate; when upstream throttles us the rate
+is halved and then recovers gradually on success (AIMD). The breaker opens
+after a run of consecutive failures and fails fast until its cooldown
+expires, then lets one trial call through (half-open).
+"""
+
+import random
+import threading
+import time
+from collections import deque
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose refill rate adapts to throttling."""
+
+    def __init__(self, rate_per_second, burst, min_rate_per_second=None):
+        self.max_rate = rate_per_second
+        self.min_rate = min_rate_per_second or rate_per_second / 16
+        self.rate = rate_per_second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=None):
+        """Take one token, waiting up to `timeout` seconds. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    if waited:
+                        self.waits += 1
+                    return True
+                delay = (1 - self._tokens) / self.rate
+            if deadline is not None and now + delay > deadline:
+                return False
+            waited = True
+            time.sleep(delay)
+
+    def throttled(self):
+        """Upstream rejected a call for rate: halve the refill rate."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def succeeded(self):
+        """Additive recovery towards the configured rate."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'rate_per_minute': round(self.rate * 60, 2),
+                'max_rate_per_minute': round(self.max_rate * 60, 2),
+                'tokens': round(self._tokens, 2),
+                'waits': self.waits
+            }
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open trial call."""
+
+    def __init__(self, failure_threshold, cooldown_seconds):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self.opened_at is None:
+            return 'closed'
+        if now - self.opened_at >= self.cooldown_seconds:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """True if a call may go ahead now."""
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_after(self):
+        """Seconds until the breaker lets a trial call through."""
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown_seconds - (time.monotonic() - self.opened_at))
+
+    def cancel_trial(self):
+        """A permitted call ended without reaching upstream; free the half-open slot."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state(time.monotonic()),
+                'consecutive_failures': self.failures,
+                'rejected': self.rejected
+            }
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff for the given (0-based) retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class HedgeBudget:
+    """
+    Caps hedged (duplicate) requests to a fraction of recent hedge-eligible
+    calls, so hedging cannot multiply quota use during a slowdown.
+    """
+
+    def __init__(self, max_rate, window=200):
+        self.max_rate = max_rate
+        self._decisions = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.denied = 0
+
+    def eligible(self):
+        """Note a hedge-eligible call (one that may later ask to hedge)."""
+        with self._lock:
+            self._decisions.append(False)
+
+    def try_hedge(self):
+        """True (and counted) if one more hedge stays within the cap."""
+        with self._lock:
+            hedged = sum(self._decisions)
+            if self._decisions and (hedged + 1) / len(self._decisions) <= self.max_rate:
+                # Mark the newest unhedged call, keeping the window length unchanged
+                for i in range(len(self._decisions) - 1, -1, -1):
+                    if not self._decisions[i]:
+                        self._decisions[i] = True
+                        return True
+            self.denied += 1
+            return False
+
+    def stats(self):
+        with self._lock:
+            calls = len(self._decisions)
+            return {
+                'window_calls': calls,
+                'window_hedge_rate': round(sum(self._decisions) / calls, 4) if calls else 0.0,
+                'max_rate': self.max_rate,
+                'denied': self.denied
+            }
@@ -0,0 +1,91 @@
+"""
+In-flight request coalescing ("single flight").
+
+While a call for a key is running, further calls with the same key wait for
+it and receive its result (or its exception) instead of doing the work again.
+Progress events emitted by the running call are fanned out to every caller,
+with earlier events replayed to callers that attach late.
+"""
+
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.events = []
+        self.listeners = []
+        # Serializes delivery so every listener sees events once and in order
+        self.delivery = threading.Lock()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, listener=None):
+        """
+        Runs fn(notify) unless a call for `key` is already in flight, in which
+        case waits for that call. Returns (result, shared) where `shared` is
+        True for callers that did not run fn themselves.
+
+        notify(*event) forwards an event to every attached listener. Listeners
+        are called outside the flight lock, so a slow listener (e.g. a job
+        progress write) only holds up the callers of its own key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if listener:
+            with call.delivery:
+                with self._lock:
+                    replay = list(call.events)
+                    call.listeners.append(listener)
+                for event in replay:
+                    listener(*event)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        def notify(*event):
+            with call.delivery:
+                with self._lock:
+                    call.events.append(event)
+                    listeners = list(call.listeners)
+                for fan_out in listeners:
+                    fan_out(*event)
+
+        try:
+            call.result = fn(notify)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls)
+            }
@@ -94,9 +94,9 @@ document.addEventListener('DOMContentLoaded', function() {
     document.addEventListener('change', updateProgress);
     document.addEventListener('input', updateProgress);
 
-    // Handle form submission for detector
+    // Handle form submission for detector (pages with a stream URL submit it themselves)
     const detectorForm = document.getElementById('detector-form');
-    if (detectorForm) {
+    if (detectorForm && !detectorForm.dataset.streamUrl) {
         detectorForm.addEventListener('submit', function(event) {
             event.preventDefault();
             const formData = new FormData(detectorForm);
@@ -105,6 +105,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 body: formData
             })
             .then(res => res.json())
+            .then(data => data.job_id ? waitForDetectorJob(data.status_url) : data)
             .then(data => {
                 if (data.error === 'non_political') {
                     showNotification("Please submit a Philippine political news article.", 'error');
@@ -140,6 +141,63 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
+// Poll a queued detector job until it finishes; resolves with the final reply
+function waitForDetectorJob(statusUrl, interval = 1000) {
+    return new Promise((resolve, reject) => {
+        function poll() {
+            fetch(statusUrl)
+                .then(res => res.json())
+                .then(data => {
+                    if (data.status === 'queued' || data.status === 'running') {
+                        setTimeout(poll, interval);
+                    } else {
+                        resolve(data);
+                    }
+                })
+                .catch(reject);
+        }
+        poll();
+    });
+}
+
+// POST a form to a Server-Sent Events endpoint and call onEvent(event, data)
+// for every message until the stream closes
+function streamDetector(url, formData, onEvent) {
+    return fetch(url, { method: 'POST', body: formData }).then(res => {
+        const type = res.headers.get('Content-Type') || '';
+        if (type.startsWith('application/json')) {
+            // Refused before streaming, e.g. 503 when the server is busy
+            return res.json().then(data => onEvent('error', data));
+        }
+        if (!res.ok || !res.body || !type.startsWith('text/event-stream')) {
+            throw new Error(`Unexpected response: HTTP ${res.status}`);
+        }
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        function read() {
+            return reader.read().then(({ done, value }) => {
+                if (done) return;
+                buffer += decoder.decode(value, { stream: true });
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const message = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    let event = 'message', data = '';
+                    message.split('\n').forEach(line => {
+                        if (line.startsWith('event:')) event = line.slice(6).trim();
+                        else if (line.startsWith('data:')) data += line.slice(5).trim();
+                    });
+                    if (data) onEvent(event, JSON.parse(data));
+                }
+                return read();
+            });
+        }
+        return read();
+    });
+}
+
 // Notification helper
 function showNotification(message, type = 'info') {
     const notification = document.createElement('div');
@@ -0,0 +1,79 @@
+"""Text normalization and hashing shared by the caching and dedup layers."""
+
+import hashlib
+import re
+import unicodedata
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Normalize article text so trivially different copies compare equal.
+
+    Applies Unicode NFKC, lowercases and collapses all whitespace runs.
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', text)
+    return _WHITESPACE_RE.sub(' ', text).strip().lower()
+
+
+def content_digest(text, *parts):
+    """SHA-256 hex digest of the normalized text plus any extra key parts."""
+    h = hashlib.sha256(normalize_text(text).encode('utf-8'))
+    for part in parts:
+        h.update(b'\0')
+        h.update(str(part).encode('utf-8'))
+    return h.hexdigest()
+
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text):
+    """Rough token count for Gemini prompts (about four characters per token)."""
+    return len(text or '') // 4 + 1
+
+
+def split_sentences(text):
+    """Split text into sentences with NLTK's punkt model, or a regex if it is unavailable."""
+    try:
+        from nltk.tokenize import sent_tokenize
+        return sent_tokenize(text)
+    except (ImportError, LookupError):
+        return [s for s in _SENTENCE_RE.split(text) if s.strip()]
+
+
+def chunk_text(text, token_budget):
+    """
+    Pack consecutive sentences into chunks of at most `token_budget` tokens.
+    A single sentence longer than the budget is split on word boundaries, and
+    a single word longer than the budget by characters, so no chunk is ever
+    over the budget.
+    """
+    max_chars = max(1, (token_budget - 1) * 4)
+    chunks, current, current_tokens = [], [], 0
+    for sentence in split_sentences(text):
+        pieces = [sentence]
+        if estimate_tokens(sentence) > token_budget:
+            words, pieces, piece = [], [], []
+            for word in sentence.split():
+                words.extend(word[i:i + max_chars] for i in range(0, len(word), max_chars))
+            for word in words:
+                if piece and estimate_tokens(' '.join(piece + [word])) > token_budget:
+                    pieces.append(' '.join(piece))
+                    piece = []
+                piece.append(word)
+            if piece:
+                pieces.append(' '.join(piece))
+
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > token_budget:
+                chunks.append(' '.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append(' '.join(current))
+    return chunks